@@ -0,0 +1,156 @@
+from __future__ import absolute_import
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Dict
+
+from logic.generator import TransactionGenerator
+from logic.writer import CsvWriter
+
+
+def current_commit() -> str:
+    """
+    Get the version being benchmarked
+    :return: the short hash of HEAD, followed by -dirty if the working tree has changes, or "unknown" outside of a git repository
+    """
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summary(times: List[float]) -> Dict[str, float]:
+    return {"min": min(times), "max": max(times), "mean": sum(times) / len(times)}
+
+
+def run_configuration(transactions: int, patterns: int, average: float, fields: int, threshold: int, repeat: int, seed: int) -> Dict:
+    """
+    Benchmark a configuration of the generator
+    :return: the timings of generation and serialization, the number of records and the peak memory
+    """
+    generation = []
+    serialization = []
+    records = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generator = TransactionGenerator(transactions, patterns, average, fields, threshold, seed=seed)
+        trees = generator.generate_data()
+        generation.append(time.perf_counter() - start)
+        records = sum(len(tree) for tree in trees)
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            with CsvWriter(os.path.join(directory, "output"), generator.attributes) as writer:
+                for tree in trees:
+                    writer.write(tree)
+            serialization.append(time.perf_counter() - start)
+        del trees
+    # memory is measured on a separate run, since tracing slows down the allocations
+    tracemalloc.start()
+    TransactionGenerator(transactions, patterns, average, fields, threshold, seed=seed).generate_data()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"transactions": transactions, "patterns": patterns, "average": average, "fields": fields, "threshold": threshold,
+            "records": records, "generation": summary(generation), "serialization": summary(serialization),
+            "records_per_second": records / summary(generation)["mean"], "peak_memory": peak_memory}
+
+
+def configuration_key(result: Dict) -> tuple:
+    return result["transactions"], result["patterns"], result["average"], result["fields"], result["threshold"]
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare benchmark results against a baseline
+    :param results: the current results
+    :param baseline: the results of the baseline
+    :param tolerance: relative slow down or memory increase accepted, e.g. 0.1 for 10%
+    :return: a description of every regression
+    """
+    baseline_results = {configuration_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        key = configuration_key(result)
+        if key not in baseline_results:
+            continue
+        old = baseline_results[key]
+        for metric in ["generation", "serialization"]:
+            if result[metric]["mean"] > old[metric]["mean"] * (1 + tolerance):
+                regressions.append("t=%d p=%d avg=%g nf=%d: %s %.3fs -> %.3fs (+%.0f%%)" % (
+                    key[0], key[1], key[2], key[3], metric, old[metric]["mean"], result[metric]["mean"],
+                    100 * (result[metric]["mean"] / old[metric]["mean"] - 1)))
+        if result["peak_memory"] > old["peak_memory"] * (1 + tolerance):
+            regressions.append("t=%d p=%d avg=%g nf=%d: peak memory %d -> %d bytes (+%.0f%%)" % (
+                key[0], key[1], key[2], key[3], old["peak_memory"], result["peak_memory"],
+                100 * (result["peak_memory"] / old["peak_memory"] - 1)))
+    return regressions
+
+
+argument_parser = argparse.ArgumentParser(description="Benchmark of the transaction generator")
+argument_parser.add_argument("-t", dest="transactions", type=int, nargs="+", help="Numbers of transactions to benchmark (int list)", default=[10, 20, 50])
+argument_parser.add_argument("-p", dest="patterns", type=int, nargs="+", help="Numbers of patterns to benchmark (int list)", default=[10])
+argument_parser.add_argument("-avg", dest="average", type=float, nargs="+", help="Average pattern lengths to benchmark (float list)", default=[10])
+argument_parser.add_argument("-nf", dest="fields", type=int, nargs="+", help="Numbers of fields to benchmark (int list)", default=[10])
+argument_parser.add_argument("-thr", dest="threshold", type=int, help="The minimum number of times that each pattern appears (int)", default=4)
+argument_parser.add_argument("-repeat", dest="repeat", type=int, help="Number of timed runs of every configuration (int)", default=5)
+argument_parser.add_argument("-seed", dest="seed", type=int, help="The seed of the generation (int)", default=0)
+argument_parser.add_argument("-out", dest="output", type=str, help="Directory where the results are stored, as <commit>.json, or <commit>-dirty.json for a modified working tree", default="benchmarks")
+argument_parser.add_argument("-compare", dest="baseline", type=str, help="Results file of the baseline to compare with", default=None)
+argument_parser.add_argument("-tolerance", dest="tolerance", type=float, help="Relative slow down accepted by the comparison (float)", default=0.1)
+argument_parser.add_argument("-plot", dest="plot", type=str, help="Plot generation time against the number of transactions in this file", default=None)
+
+if __name__ == "__main__":
+    args = argument_parser.parse_args()
+    commit = current_commit()
+    output_file = os.path.join(args.output, commit + ".json")
+    baseline = None
+    if args.baseline is not None:
+        # read before the results are written, and never overwritten by them
+        if os.path.abspath(args.baseline) == os.path.abspath(output_file):
+            argument_parser.error("The results of %s would overwrite the baseline %s, change -out or the working tree" % (commit, args.baseline))
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    results = {"commit": commit, "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": []}
+    for transactions, patterns, average, fields in itertools.product(args.transactions, args.patterns, args.average, args.fields):
+        result = run_configuration(transactions, patterns, average, fields, args.threshold, args.repeat, args.seed)
+        results["results"].append(result)
+        print("t=%d p=%d avg=%g nf=%d: %d records, generation %.3fs, serialization %.3fs, %.0f records/s, peak %.1f MB" % (
+            transactions, patterns, average, fields, result["records"], result["generation"]["mean"],
+            result["serialization"]["mean"], result["records_per_second"], result["peak_memory"] / (1 << 20)))
+    # maximum resident set size of the whole benchmark, in KB on Linux
+    results["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    os.makedirs(args.output, exist_ok=True)
+    with open(output_file, "w") as file:
+        json.dump(results, file, indent=2)
+    print("Results written to %s" % output_file)
+    if args.plot is not None:
+        import matplotlib.pyplot as plt
+        plt.figure()
+        plt.xlabel("Total transactions")
+        plt.ylabel("Time [s]")
+        plt.grid()
+        for patterns, average, fields in itertools.product(args.patterns, args.average, args.fields):
+            selected = [result for result in results["results"]
+                        if (result["patterns"], result["average"], result["fields"]) == (patterns, average, fields)]
+            line = plt.plot([result["transactions"] for result in selected], [result["generation"]["mean"] for result in selected],
+                            "o-", label="p=%d avg=%g nf=%d" % (patterns, average, fields))
+            plt.fill_between([result["transactions"] for result in selected], [result["generation"]["min"] for result in selected],
+                             [result["generation"]["max"] for result in selected], color=line[0].get_color(), alpha=0.1)
+        plt.legend(loc="upper left")
+        plt.savefig(args.plot)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print("Regressions against %s:" % baseline["commit"])
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("No regressions against %s" % baseline["commit"])
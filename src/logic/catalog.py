@@ -0,0 +1,63 @@
+from __future__ import absolute_import
+
+import json
+import os
+
+import numpy as np
+
+from logic.generator import TransactionGenerator, PatternTemplate
+from logic.manifest import pattern_to_nodes, nodes_to_pattern
+from logic.stats import GenerationStats
+
+# version of the catalog format, checked when it is loaded
+CATALOG_VERSION = 2
+
+
+def save_catalog(generator: TransactionGenerator, path: str) -> None:
+    """
+    Save everything that the transactions of a generator depend on: its parameters and seed, the field
+    names, the patterns and how many times each one is embedded. The placement of the patterns and the random
+    values of the transactions come from streams derived from the seed and the shard index, so no other random
+    state is needed. The catalog is a numpy .npz file, with the occurrences as an array and the rest as JSON
+    :param generator: the generator, prepared if it is not yet
+    :param path: the catalog file, used as given even without the .npz extension
+    """
+    generator.prepare()
+    description = {"version": CATALOG_VERSION, "seed": generator.seed, "total_trees": generator.total_trees,
+                   "total_patterns": generator.total_patterns, "avg_pattern_length": generator.avg_pattern_length,
+                   "fields": generator.fields, "threshold": generator.threshold, "ids": generator.ids,
+                   "cardinality": generator.cardinality, "skew": generator.skew,
+                   "shard_size": generator.shard_size, "first_tree": generator.first_tree,
+                   "first_shard": generator.first_shard, "attributes": generator.attributes,
+                   "patterns": [pattern_to_nodes(pattern) for pattern in generator.patterns]}
+    # saved through a file, otherwise numpy would add .npz to the path, and replaced atomically, so that an
+    # interruption never leaves a partial catalog
+    with open(path + ".tmp", "wb") as file:
+        np.savez(file, description=np.array(json.dumps(description)), occurrences=generator.occurrences)
+    os.replace(path + ".tmp", path)
+
+
+def load_catalog(path: str, stats: GenerationStats = None) -> TransactionGenerator:
+    """
+    Create a generator from a catalog saved by save_catalog. It produces the same transactions as the saved one
+    :param path: the catalog file
+    :param stats: where the time of every phase and the counters are collected. If None, new ones are created
+    :return: the generator, already prepared
+    """
+    with np.load(path) as catalog:
+        description = json.loads(str(catalog["description"]))
+        if description["version"] != CATALOG_VERSION:
+            raise ValueError("Unsupported catalog version %d, expected %d" % (description["version"], CATALOG_VERSION))
+        occurrences = catalog["occurrences"]
+    generator = TransactionGenerator(description["total_trees"], description["total_patterns"],
+                                     description["avg_pattern_length"], description["fields"], description["threshold"],
+                                     seed=description["seed"], stats=stats, ids=description["ids"],
+                                     cardinality=description.get("cardinality"), skew=description.get("skew", 0.0),
+                                     shard_size=description["shard_size"])
+    generator.attributes = description["attributes"]
+    generator.first_tree = description["first_tree"]
+    generator.first_shard = description["first_shard"]
+    generator.patterns = [nodes_to_pattern(nodes) for nodes in description["patterns"]]
+    generator.pattern_templates = [PatternTemplate(pattern, generator.attributes, generator.dictionary) for pattern in generator.patterns]
+    generator.occurrences = occurrences
+    return generator
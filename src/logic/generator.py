@@ -1,62 +1,201 @@
 from __future__ import absolute_import
 
-from typing import List, Dict
+import copy
+import gc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterator, Tuple
 
-from models.tree import PatternTree, TransactionTree
-from logic.values import ValueGenerator
+from models.tree import PatternTree, TransactionTree, TransactionBatch
+from logic.stats import GenerationStats
+from logic.values import ValueGenerator, ValuePool, ValueDictionary, shared_dictionary
 import random
-import copy
 import numpy as np
 import math
 
 
 class PatternGenerator:
+    # probability that a node of a pattern, other than the root, is empty, i.e. it represents any record
+    EMPTY_PROBABILITY = 0.2
+    # number of nodes whose fields are drawn together by generate_patterns
+    CHUNK_SIZE = 1 << 16
+
     @staticmethod
-    def generate_pattern(length: int, fields: List[str]) -> PatternTree:
+    def _random_node(fields: List[str], rng, values: ValuePool, seen: set) -> PatternTree:
+        """
+        Create a pattern node with random fields and values, different from the ones already seen
+        :param fields: list of the field names
+        :param rng: random number generator to use
+        :param values: pool from which the field values are drawn
+        :param seen: fields of the nodes already in the pattern, updated with the new node
+        :return: the new node
+        """
+        while True:
+            # record in the pattern with multiple fields
+            names = rng.sample(fields, rng.randint(1, len(fields)))
+            fields_for_record: Dict[str, str] = {name: ValueGenerator.random_string(values) for name in names}
+            key = frozenset(fields_for_record.items())
+            if key not in seen:  # force nodes to be different either in field or value
+                seen.add(key)
+                return PatternTree(fields_for_record)
+
+    @staticmethod
+    def generate_pattern(length: int, fields: List[str], rng: random.Random = None, values: ValuePool = None) -> PatternTree:
         """
         Create a pattern, which is a tree
         :param length: length of the pattern, at least 1. It is the number of edges. Number of nodes: 1 + length
         :param fields: list of the field names
+        :param rng: random number generator to use. If None, the global one of the random module is used
+        :param values: pool from which the field values are drawn. If None, an unseeded pool is used
         :return: the PatternTree, route of the pattern
         """
         if length < 1:
             raise ValueError("The length must be at least 1. Given %d" % length)
-        # first, create all nodes
-        nodes = []
-        while len(nodes) < length + 1:
-            # record in the pattern with multiple fields
-            number_of_fields = random.randint(1, len(fields))
-            fields_for_record: Dict[str, str] = {}
-            fields_name = [f for f in fields]
-            for _ in range(number_of_fields):
-                field_name = fields_name[random.randint(0, len(fields_name) - 1)]
-                field_value = ValueGenerator.random_string()
-                fields_for_record[field_name] = field_value
-                fields_name.remove(field_name)
-            node = PatternTree(fields_for_record)
-            if node not in nodes:  # quick fix to force nodes to be different either in field or value
-                nodes.append(node)
-        # second, build the tree, choosing randomly where to append
-        # another random choice is to create an empty node, which represents any value
-        root: PatternTree = nodes[random.randint(0, len(nodes) - 1)]
+        if rng is None:
+            rng = random
+        # nodes are independent, so they are created when they are appended
+        seen = set()
+        root = PatternGenerator._random_node(fields, rng, values, seen)
         included = [root]
-        nodes.remove(root)
         for _ in range(length):
-            parent = included[random.randint(0, len(included) - 1)]
-            # with prob = 20%, create an empty node
-            if random.randint(1, 5) == 1:
+            parent = included[rng.randint(0, len(included) - 1)]
+            # with prob = 20%, create an empty node, which represents any value
+            if rng.random() < PatternGenerator.EMPTY_PROBABILITY:
                 child = PatternTree({})
             else:
-                child = nodes[random.randint(0, len(nodes) - 1)]
-                nodes.remove(child)
+                child = PatternGenerator._random_node(fields, rng, values, seen)
             parent.add_child(child)
             included.append(child)
         return root
 
+    @staticmethod
+    def generate_patterns(lengths: List[int], fields: List[str], np_rng: np.random.Generator = None, values: ValuePool = None) -> List[PatternTree]:
+        """
+        Create many patterns at once, with the same distribution as generate_pattern. The structure of all
+        the patterns and the fields of all the nodes are drawn with a few vectorized calls, and the nodes are
+        only linked into trees at the end. Values are random 128-bit strings, so two nodes of a pattern never
+        have the same fields and values, and they are not compared as generate_pattern does
+        :param lengths: length of every pattern, each at least 1
+        :param fields: list of the field names
+        :param np_rng: random number generator to use. If None, an unseeded one is used
+        :param values: pool from which the field values are drawn. If None, an unseeded pool is used
+        :return: the roots of the patterns
+        """
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if len(lengths) > 0 and lengths.min() < 1:
+            raise ValueError("The length must be at least 1. Given %d" % lengths.min())
+        if np_rng is None:
+            np_rng = np.random.default_rng()
+        if values is None:
+            values = ValuePool()
+        # edge k of a pattern appends a node to one of the k nodes already included, or an empty node
+        edge_starts = np.cumsum(lengths) - lengths
+        positions = np.arange(int(lengths.sum())) - np.repeat(edge_starts, lengths) + 1
+        parents = (np_rng.random(len(positions)) * positions).astype(np.int64)
+        empty = np_rng.random(len(positions)) < PatternGenerator.EMPTY_PROBABILITY
+        # nodes of all the patterns in a flat list: the root of every pattern, followed by the nodes of its edges
+        node_starts = np.repeat(edge_starts + np.arange(len(lengths)), lengths)
+        empty_nodes = np.zeros(len(lengths) + len(positions), dtype=bool)
+        empty_nodes[node_starts + positions] = empty
+        # millions of objects are created and all of them are kept: the garbage collector would scan them over and over
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            records = iter(PatternGenerator._random_records(len(empty_nodes) - int(empty.sum()), fields, np_rng, values))
+            nodes = [PatternTree({}) if node_empty else PatternTree(next(records)) for node_empty in empty_nodes.tolist()]
+            for parent, child in zip((node_starts + parents).tolist(), (node_starts + positions).tolist()):
+                nodes[parent].add_child(nodes[child])
+        finally:
+            if collecting:
+                gc.enable()
+        return [nodes[start] for start in (edge_starts + np.arange(len(lengths))).tolist()]
+
+    @staticmethod
+    def _random_records(count: int, fields: List[str], np_rng: np.random.Generator, values: ValuePool) -> List[Dict[str, str]]:
+        """
+        Draw the fields of many pattern nodes: each has between 1 and len(fields) distinct fields, with random values
+        :param count: number of nodes
+        :param fields: list of the field names
+        :param np_rng: random number generator to use
+        :param values: pool from which the field values are drawn
+        :return: the fields of the nodes
+        """
+        field_names = np.array(fields, dtype=object)
+        records: List[Dict[str, str]] = []
+        for start in range(0, count, PatternGenerator.CHUNK_SIZE):
+            size = min(PatternGenerator.CHUNK_SIZE, count - start)
+            field_counts = np_rng.integers(1, len(fields) + 1, size=size)
+            # a random permutation of the fields for every node, of which the first field_counts are kept
+            permutations = np.argsort(np_rng.random((size, len(fields))), axis=1)
+            kept = np.arange(len(fields)) < field_counts[:, None]
+            names = field_names[permutations[kept]]
+            node_values = np.array(values.take(len(names)), dtype=object)
+            node_starts = np.cumsum(field_counts) - field_counts
+            chunk = np.empty(size, dtype=object)
+            # the nodes with the same number of fields are built together, from the rows of a 2D selection
+            for field_count in np.unique(field_counts).tolist():
+                selected = np.flatnonzero(field_counts == field_count)
+                columns = node_starts[selected][:, None] + np.arange(field_count)
+                chunk[selected] = list(map(dict, map(zip, names[columns].tolist(), node_values[columns].tolist())))
+            records.extend(chunk.tolist())
+        return records
+
+
+class PatternTemplate:
+    """
+    A pattern compiled once into a flat form: its nodes in pre-order, each with the fields fixed
+    by the pattern and the offset of its parent, so that embedding it only fills in the free values
+    """
+
+    def __init__(self, pattern: PatternTree, attributes: List[str], dictionary: ValueDictionary = None) -> None:
+        """
+        Compile a pattern
+        :param pattern: root of the pattern
+        :param attributes: names of all the fields of a record, excluding tid, rid and parent
+        :param dictionary: if set, the fixed values are stored as their codes in this dictionary
+        """
+        nodes = pattern.get_nodes_list()
+        offsets = {id(node): offset for offset, node in enumerate(nodes)}
+        self.fields: List[Dict[str, str]] = [dict(node.fields) for node in nodes]
+        self.parents: List[int] = [-1] * len(nodes)
+        for offset, node in enumerate(nodes):
+            for child in node.children:
+                self.parents[offsets[id(child)]] = offset
+        # the pattern as arrays that can be copied over the columns of a TransactionBatch
+        self.parent_offsets = np.array(self.parents, dtype=np.int32)
+        self.fixed_mask = np.array([[field in fixed for field in attributes] for fixed in self.fields], dtype=bool).reshape(len(nodes), len(attributes))
+        dtype = TransactionBatch.VALUE_DTYPE if dictionary is None else dictionary.code_dtype
+        self.fixed_values = np.zeros((len(nodes), len(attributes)), dtype=dtype)
+        for offset, fixed in enumerate(self.fields):
+            for column, field in enumerate(attributes):
+                if field in fixed:
+                    self.fixed_values[offset, column] = bytes.fromhex(fixed[field]) if dictionary is None else dictionary.code(column, fixed[field])
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+
+# generator used by the worker processes, set once per process by _init_worker
+_worker_generator = None
+
+
+def _init_worker(generator) -> None:
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _generate_worker_shard(shard: int) -> Tuple[List[TransactionBatch], GenerationStats]:
+    stats = GenerationStats()
+    return _worker_generator.generate_shard(shard, stats), stats
+
 
 class TransactionGenerator:
+    # number of trees built from the same derived seed. It does not depend on the number of processes,
+    # so the output for a given seed is the same whatever the parallelism
+    SHARD_SIZE = 1000
 
-    def __init__(self, total_trees: int, total_patterns: int, avg_pattern_length: float, fields: int, threshold: int, print_pattern: bool = False) -> None:
+    def __init__(self, total_trees: int, total_patterns: int, avg_pattern_length: float, fields: int, threshold: int, print_pattern: bool = False, seed: int = None, stats: GenerationStats = None, ids: str = "hex",
+                 cardinality: int = None, skew: float = 0.0, shard_size: int = None) -> None:
         """
         Create a node that is part of a pattern
         :param total_trees: the total number of trees that will be generated
@@ -65,6 +204,14 @@ class TransactionGenerator:
         :param fields: number of fields each record has. It has to be at least 4
         :param threshold: number of times a pattern has to appear to be a pattern
         :param print_pattern: if true, the generated pattern are printed
+        :param seed: seed of the generation. If None, a random one is chosen and stored in self.seed
+        :param stats: where the time of every phase and the counters are collected. If None, new ones are created
+        :param ids: "hex" for random 32-character hex ids, "int" for 64-bit integer ids: the tid is the index of the
+        transaction, and the rid is the index of the shard in the upper 32 bits and a counter in the lower ones
+        :param cardinality: if set, every field takes one of this number of values, including the values of the patterns,
+        and records store the codes of their values. If None, every value is a new random string
+        :param skew: with a cardinality, exponent of the Zipf distribution of the values, 0 for uniform
+        :param shard_size: number of trees built from the same derived seed. If None, SHARD_SIZE. The output depends on it
         """
         if total_trees < 1:
             raise ValueError("There must be at least one tree. Given %d" % total_trees)
@@ -74,49 +221,92 @@ class TransactionGenerator:
             raise ValueError("The number of filed must be at least 4, given %d" % fields)
         if threshold < 1:
             raise ValueError("A pattern must appear at least once. Given %d" % threshold)
+        if ids not in ["hex", "int"]:
+            raise ValueError("The ids must be either hex or int. Given %s" % ids)
+        if shard_size is not None and shard_size < 1:
+            raise ValueError("A shard must have at least one tree. Given %d" % shard_size)
         self.total_patterns: int = total_patterns
         self.total_trees: int = total_trees
         self.avg_pattern_length = avg_pattern_length
         self.fields = fields
         self.threshold = threshold
         self.print_pattern = print_pattern
-        self.attributes = ValueGenerator.generate_field_names(self.fields - 3)    # exclude rid, tid and parent
+        self.ids = ids
+        self.seed: int = np.random.SeedSequence().entropy if seed is None else seed
+        self.stats = GenerationStats() if stats is None else stats
+        self.stats.total_transactions = total_trees
+        with self.stats.phase("field names"):
+            self.attributes = ValueGenerator.generate_field_names(self.fields - 3, ValuePool(self._derive_seed(0)))    # exclude rid, tid and parent
+        self.cardinality = cardinality
+        self.skew = skew
+        self.dictionary: ValueDictionary = None
+        if cardinality is not None:
+            with self.stats.phase("dictionaries"):
+                self.dictionary = shared_dictionary(len(self.attributes), cardinality, skew, self._derive_seed(7))
+        self.shard_size = self.SHARD_SIZE if shard_size is None else shard_size
+        self.shards = (self.total_trees + self.shard_size - 1) // self.shard_size
+        # index of the first transaction and of the first shard, not 0 when this generator extends a previous one
+        self.first_tree = 0
+        self.first_shard = 0
+        # patterns and how many times each one is embedded, computed once by prepare and shared by all the shards
+        self.patterns: List[PatternTree] = None
+        self.pattern_templates: List[PatternTemplate] = None
+        self.occurrences: np.ndarray = None
 
-    def tree_pattern_to_transaction_tree(self, original: PatternTree, parent: TransactionTree = None) -> TransactionTree:
+    def _derive_seed(self, *key: int) -> int:
+        """
+        Derive an independent seed from the generation seed
+        :param key: identifier of the random stream, e.g. (1, shard)
+        :return: the derived seed
+        """
+        return int(np.random.SeedSequence(self.seed, spawn_key=key).generate_state(1, np.uint64)[0])
+
+    def tree_pattern_to_transaction_tree(self, original: PatternTree, parent: TransactionTree = None, values: ValuePool = None) -> TransactionTree:
         """
         Translate a PatternTree to a TransactionTree
         :param original: the PatternTree to be converted
         :param parent: parent node of original
+        :param values: pool from which the ids are drawn. If None, an unseeded pool is used
         :return: the converted TransactionTree
         """
-        rid = ValueGenerator.random_string()
-        attributes = {"rid": rid}
-        # add attributes of the pattern
-        for field in original.fields:
-            attributes[field] = original.fields[field]
-        node = TransactionTree(attributes, rid)
-        node.parent = parent
-        node.fields["parent"] = None if parent is None else parent.rid
-        for tree in original.children:
-            node.add_child(self.tree_pattern_to_transaction_tree(tree, node))
-        return node
+        root = None
+        # pattern nodes still to translate, in pre-order, with the translation of their parent
+        stack = [(original, parent)]
+        while len(stack) > 0:
+            pattern_node, translated_parent = stack.pop()
+            rid = ValueGenerator.random_string(values)
+            attributes = {"rid": rid}
+            # add attributes of the pattern
+            for field in pattern_node.fields:
+                attributes[field] = pattern_node.fields[field]
+            node = TransactionTree(attributes, rid)
+            node.parent = translated_parent
+            node.fields["parent"] = None if translated_parent is None else translated_parent.rid
+            if root is None:
+                root = node
+            else:
+                translated_parent.add_child(node)
+            stack.extend((child, node) for child in reversed(pattern_node.children))
+        return root
 
-    def populate_transaction_pattern(self, to_populate: TransactionTree, tid: str) -> None:
+    def populate_transaction_pattern(self, to_populate: TransactionTree, tid: str, values: ValuePool = None) -> None:
         """
         Add missing fields to a TransactionTree node
         :param to_populate: the TransactionTree node to be populated
         :param tid: id of the node
+        :param values: pool from which the ids and values are drawn. If None, an unseeded pool is used
         """
-        to_populate.fields["tid"] = tid
-        to_populate.rid = ValueGenerator.random_string()
-        to_populate.fields["rid"] = to_populate.rid
-        for field in self.attributes:
-            if field not in to_populate.fields:
-                to_populate.fields[field] = ValueGenerator.random_string()
-        for child in to_populate.children:
-            child.parent = to_populate.rid
-            child.fields["parent"] = to_populate.rid
-            self.populate_transaction_pattern(child, tid)
+        for node in to_populate.iter_nodes():
+            # the parent of node is already populated, and has set its rid in node
+            node.fields["tid"] = tid
+            node.rid = ValueGenerator.random_string(values)
+            node.fields["rid"] = node.rid
+            for field in self.attributes:
+                if field not in node.fields:
+                    node.fields[field] = ValueGenerator.random_string(values)
+            for child in node.children:
+                child.parent = node.rid
+                child.fields["parent"] = node.rid
 
     @staticmethod
     def _print_patterns(patterns: List[PatternTree]) -> None:
@@ -127,77 +317,314 @@ class TransactionGenerator:
             patterns[i].print_tree()
             print("\n")
 
-    def generate_data(self) -> List[TransactionTree]:
+    def prepare(self) -> None:
         """
-        Generate all the transactions
-        :return: list of generated transactions
+        Generate the patterns and count how many times each one is embedded. This is done once,
+        and shared by all the shards
         """
+        if self.pattern_templates is not None:
+            return
+        np_rng = np.random.default_rng(self._derive_seed(2))
+        values = ValuePool(self._derive_seed(4))
         # Patterns are generated
-        pattern_list: List[PatternTree] = []
-        fields = [field for field in self.attributes]
-        pattern_min_length = math.inf
-        pattern_max_length = 0
-        for _ in range(self.total_patterns):
-            pattern_length = int(max(1, np.random.poisson(self.avg_pattern_length)))
-            if pattern_length < pattern_min_length:
-                pattern_min_length = pattern_length
-            if pattern_length > pattern_max_length:
-                pattern_max_length = pattern_length
-            pattern_list.append(PatternGenerator.generate_pattern(pattern_length, fields))
+        with self.stats.phase("patterns"):
+            pattern_lengths = np.maximum(1, np_rng.poisson(self.avg_pattern_length, size=self.total_patterns))
+            pattern_list = PatternGenerator.generate_patterns(pattern_lengths, self.attributes, np_rng, values)
+            if self.dictionary is not None:
+                self._intern_patterns(pattern_list, np.random.default_rng(self._derive_seed(8)))
+        pattern_min_length = int(pattern_lengths.min()) if self.total_patterns > 0 else math.inf
+        pattern_max_length = int(pattern_lengths.max()) if self.total_patterns > 0 else 0
+        self.stats.count("patterns", len(pattern_list))
+        self.stats.count("random values", values.served)
         # if print flag is set, print details
         if self.print_pattern:
             TransactionGenerator._print_patterns(pattern_list)
 
-        # change PatternTree nodes into TransactionTree nodes
-        pattern_for_transaction: List[TransactionTree] = []
-        for pattern in pattern_list:
-            pattern_for_transaction.append(self.tree_pattern_to_transaction_tree(pattern))
-        pattern_tree_indexes = {}
-        for pattern in pattern_for_transaction:
-            tree_indexes = []
-            for _ in range(int(self.total_trees - (((len(pattern.get_nodes_list())) - pattern_min_length - 1) * (
-                    (self.total_trees - self.threshold) / max(1, pattern_max_length - pattern_min_length))))):
-                tree_indexes.append(random.randint(0, self.total_trees - 1))
-            pattern_tree_indexes[pattern] = tree_indexes
-
-        # Trees are generated
-        tree_list: List[TransactionTree] = []
-        for index in range(self.total_trees):
-            chosen_patterns = []
-            transaction_id = ValueGenerator.random_string()
-            for pattern in pattern_for_transaction:
-                for _ in range(pattern_tree_indexes[pattern].count(index)):
-                    chosen_patterns.append(copy.deepcopy(pattern))
-            for pattern in chosen_patterns:
-                self.populate_transaction_pattern(pattern, transaction_id)
-            random_nodes: List[TransactionTree] = []
-            # Random nodes generation
-            for _ in range(1 + int(self.avg_pattern_length + self.avg_pattern_length * len(chosen_patterns))):
-                rid = ValueGenerator.random_string()
-                fields_for_record: Dict[str, str] = {"tid": transaction_id, "rid": rid, "parent": None}
-                for field in self.attributes:
-                    field_value = ValueGenerator.random_string()
-                    fields_for_record[field] = field_value
-                random_nodes.append(TransactionTree(fields_for_record, rid))
-            random_nodes.extend(chosen_patterns)
-            selected_root = random_nodes[random.randint(0, len(random_nodes) - 1)]
-            root = copy.deepcopy(selected_root)
-            current_tree: List[TransactionTree] = []
-            if selected_root in chosen_patterns:
-                current_tree.extend(root.get_nodes_list())
-            else:
-                current_tree.append(root)
-            random_nodes.remove(selected_root)
-            while len(random_nodes) > 0:
-                selected_node_to_append = random_nodes[random.randint(0, len(random_nodes) - 1)]
-                node_to_append = copy.deepcopy(selected_node_to_append)
-                chosen_parent = current_tree[random.randint(0, len(current_tree) - 1)]
-                chosen_parent.add_child(node_to_append)
-                node_to_append.fields["parent"] = chosen_parent.rid
-                if selected_node_to_append in chosen_patterns:
-                    current_tree.extend(node_to_append.get_nodes_list())
-                else:
-                    current_tree.append(node_to_append)
-                random_nodes.remove(selected_node_to_append)
-            tree_list.append(root)
+        # compile the patterns once, so that embedding them is a cheap instantiation
+        with self.stats.phase("pattern compilation"):
+            pattern_templates = [PatternTemplate(pattern, self.attributes, self.dictionary) for pattern in pattern_list]
+        self.occurrences = self._count_occurrences([len(template) for template in pattern_templates],
+                                                   pattern_min_length, pattern_max_length)
+        self.patterns = pattern_list
+        self.pattern_templates = pattern_templates
+
+    def _intern_patterns(self, patterns: List[PatternTree], np_rng: np.random.Generator) -> None:
+        """
+        Replace the values of the patterns with values of the dictionary, drawn with its distribution.
+        Nodes of a pattern can become equal, when their fields and values are drawn the same
+        :param patterns: the patterns, modified in place
+        :param np_rng: random number generator to use
+        """
+        columns = {field: column for column, field in enumerate(self.attributes)}
+        nodes = [node for pattern in patterns for node in pattern.get_nodes_list()]
+        codes = self.dictionary.draw(np_rng, sum(len(node.fields) for node in nodes)).tolist()
+        position = 0
+        for node in nodes:
+            for field in node.fields:
+                node.fields[field] = self.dictionary.value(columns[field], codes[position])
+                position += 1
+
+    def generate_shard(self, shard: int, stats: GenerationStats = None) -> List[TransactionBatch]:
+        """
+        Generate the trees of a shard, i.e. the indexes from shard * shard_size up to the next shard.
+        Every shard has its own random stream, so shards can be generated in any order or process
+        :param shard: index of the shard, between 0 and self.shards - 1
+        :param stats: where the phases of the shard are collected. If None, self.stats
+        :return: the generated trees of the shard
+        """
+        if stats is None:
+            stats = self.stats
+        self.prepare()
+        np_rng = np.random.default_rng(self._derive_seed(3, self.first_shard + shard))
+        values = ValuePool(self._derive_seed(5, self.first_shard + shard))
+        with stats.phase("placement"):
+            pattern_indexes, tree_offsets = self.shard_placement(shard, np_rng)
+        tree_list: List[TransactionBatch] = []
+        # integer record ids of the shard, prefixed by the shard index
+        next_rid = (self.first_shard + shard) << 32
+        first = shard * self.shard_size
+        for index in range(first, min(self.total_trees, first + self.shard_size)):
+            placed = pattern_indexes[tree_offsets[index - first]:tree_offsets[index - first + 1]]
+            tree = self._generate_tree(placed, np_rng, values, stats, self.first_tree + index, next_rid)
+            next_rid += len(tree)
+            stats.count("transactions")
+            stats.count("records", len(tree))
+            stats.count("embedded patterns", len(placed))
+            tree_list.append(tree)
+            stats.progress()
+        stats.count("random values", values.served)
         return tree_list
+
+    def iter_transactions(self, processes: int = 1, start: int = 0, stop: int = None) -> Iterator[TransactionBatch]:
+        """
+        Generate the transactions shard by shard. Only the shards being built are kept in memory,
+        so the caller can consume (e.g. write) the transactions before the next ones are created
+        :param processes: number of worker processes generating the shards
+        :param start: index of the first transaction, e.g. to skip the ones already written before an interruption.
+        Only the shard containing it is partially regenerated
+        :param stop: index after the last transaction, e.g. the end of the slice of a node. If None, all the transactions
+        :return: an iterator over the generated transactions, in index order
+        """
+        if stop is None:
+            stop = self.total_trees
+        if not 0 <= start <= stop <= self.total_trees:
+            raise ValueError("The transactions must be between 0 and %d. Given %d to %d" % (self.total_trees, start, stop))
+        self.prepare()
+        shards = range(start // self.shard_size, (stop + self.shard_size - 1) // self.shard_size)
+        if processes <= 1:
+            for shard in shards:
+                yield from self._trim(shard, self.generate_shard(shard), start, stop)
+            self.stats.finish()
+            return
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self,)) as executor:
+            # keep a bounded number of shards in flight, so that memory does not grow with the output
+            pending = deque()
+            for shard in shards:
+                pending.append((shard, executor.submit(_generate_worker_shard, shard)))
+                if len(pending) >= 2 * processes:
+                    done, future = pending.popleft()
+                    yield from self._trim(done, self._collect(future.result()), start, stop)
+            while len(pending) > 0:
+                done, future = pending.popleft()
+                yield from self._trim(done, self._collect(future.result()), start, stop)
+        self.stats.finish()
+
+    def _trim(self, shard: int, trees: List[TransactionBatch], start: int, stop: int) -> List[TransactionBatch]:
+        """
+        Keep the trees of a shard with an index between start and stop
+        :param shard: index of the shard
+        :param trees: all the trees of the shard
+        :param start: index of the first transaction to keep
+        :param stop: index after the last transaction to keep
+        :return: the trees kept
+        """
+        first = shard * self.shard_size
+        return trees[max(0, start - first):stop - first]
+
+    def node_slice(self, node: int, nodes: int) -> Tuple[int, int]:
+        """
+        Split the transactions among nodes that generate them independently, e.g. the machines of a cluster.
+        Every node gets a contiguous block of about the same number of transactions, so the union of the slices,
+        in node order, is the same as the output of a single node. A shard split between two nodes is generated
+        by both, and each one keeps its own transactions
+        :param node: index of the node, between 0 and nodes - 1
+        :param nodes: number of nodes, at most the number of transactions
+        :return: the index of the first transaction of the node and the index after its last one
+        """
+        if nodes < 1:
+            raise ValueError("There must be at least one node. Given %d" % nodes)
+        if nodes > self.total_trees:
+            raise ValueError("There cannot be more nodes than transactions. Given %d nodes for %d transactions" % (nodes, self.total_trees))
+        if not 0 <= node < nodes:
+            raise ValueError("The node must be between 0 and %d. Given %d" % (nodes - 1, node))
+        return self.total_trees * node // nodes, self.total_trees * (node + 1) // nodes
+
+    def _collect(self, result: Tuple[List[TransactionBatch], GenerationStats]) -> List[TransactionBatch]:
+        """
+        Merge the statistics of a shard generated by a worker process
+        :param result: the trees and the statistics of the shard
+        :return: the trees of the shard
+        """
+        trees, stats = result
+        self.stats.merge(stats)
+        self.stats.progress()
+        return trees
+
+    def _pattern_occurrences(self, pattern_nodes: int, pattern_min_length: int, pattern_max_length: int) -> int:
+        """
+        Compute how many times a pattern is placed among the trees: the shortest patterns are placed
+        total_trees times, the longest ones threshold times
+        :param pattern_nodes: number of nodes of the pattern
+        :param pattern_min_length: length (number of edges) of the shortest pattern
+        :param pattern_max_length: length (number of edges) of the longest pattern
+        :return: the number of occurrences of the pattern
+        """
+        return int(self.total_trees - ((pattern_nodes - pattern_min_length - 1) * (
+                (self.total_trees - self.threshold) / max(1, pattern_max_length - pattern_min_length))))
+
+    def _count_occurrences(self, pattern_sizes: List[int], pattern_min_length: int, pattern_max_length: int) -> np.ndarray:
+        """
+        Compute how many times every pattern is embedded among all the trees
+        :param pattern_sizes: number of nodes of each pattern
+        :param pattern_min_length: length (number of edges) of the shortest pattern
+        :param pattern_max_length: length (number of edges) of the longest pattern
+        :return: the number of occurrences of each pattern
+        """
+        return np.array([max(0, self._pattern_occurrences(size, pattern_min_length, pattern_max_length))
+                         for size in pattern_sizes], dtype=np.int64)
+
+    def _shard_occurrences(self, shard: int) -> np.ndarray:
+        """
+        Count how many occurrences of every pattern fall in a shard. The occurrences of a range of shards are
+        split between its two halves with a binomial draw, proportional to their number of trees, and the
+        half containing the shard is split again. Every split has its own random stream, so the counts of
+        a shard need log2(shards) draws, and the counts of all the shards always sum to self.occurrences,
+        as if every occurrence was placed in a tree chosen uniformly at random
+        :param shard: index of the shard, between 0 and self.shards - 1
+        :return: the number of occurrences of each pattern in the shard
+        """
+        counts = self.occurrences
+        low, high = 0, self.shards
+        while high - low > 1:
+            middle = (low + high) // 2
+            trees = min(self.total_trees, high * self.shard_size) - low * self.shard_size
+            np_rng = np.random.default_rng(self._derive_seed(9, self.first_shard, low, high))
+            left = np_rng.binomial(counts, (middle - low) * self.shard_size / trees)
+            if shard < middle:
+                counts, high = left, middle
+            else:
+                counts, low = counts - left, middle
+        return counts
+
+    def shard_placement(self, shard: int, np_rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Choose the trees of a shard in which its occurrences of every pattern are embedded, each one in
+        a tree chosen uniformly at random. The patterns placed in tree i of the shard are
+        pattern_indexes[tree_offsets[i]:tree_offsets[i + 1]], in pattern order
+        :param shard: index of the shard, between 0 and self.shards - 1
+        :param np_rng: random number generator of the shard
+        :return: the pattern indexes sorted by tree, and the offsets of each tree in that array
+        """
+        self.prepare()
+        trees = min(self.total_trees, (shard + 1) * self.shard_size) - shard * self.shard_size
+        counts = self._shard_occurrences(shard)
+        tree_indexes = np_rng.integers(0, trees, size=int(counts.sum()), dtype=np.int32)
+        pattern_indexes = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        # stable sort keeps the patterns of a tree in pattern order
+        order = np.argsort(tree_indexes, kind="stable")
+        tree_offsets = np.zeros(trees + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tree_indexes, minlength=trees), out=tree_offsets[1:])
+        return pattern_indexes[order], tree_offsets
+
+    def _generate_tree(self, placed: np.ndarray, np_rng: np.random.Generator, values: ValuePool, stats: GenerationStats,
+                       index: int, first_rid: int) -> TransactionBatch:
+        """
+        Build a single transaction, embedding the given patterns among random records. Random records
+        and patterns are units, attached in a random order, each one to a record chosen uniformly
+        among the ones already in the tree
+        :param placed: indexes of the patterns that have to appear in the transaction
+        :param np_rng: random number generator of the shard
+        :param values: pool of random values of the shard
+        :param stats: where the time of the phases is collected
+        :param index: index of the transaction, used as tid with integer ids
+        :param first_rid: first record id, used with integer ids
+        :return: the generated transaction
+        """
+        chosen_patterns = [self.pattern_templates[pattern_index] for pattern_index in placed]
+        random_records = 1 + int(self.avg_pattern_length + self.avg_pattern_length * len(chosen_patterns))
+        with stats.phase("assembly"):
+            # units are the random records, then the patterns. They are attached in a random order, and the
+            # records are laid out in that order, so that a parent always comes before its children
+            sizes = np.ones(random_records + len(chosen_patterns), dtype=np.int64)
+            sizes[random_records:] = [len(pattern) for pattern in chosen_patterns]
+            order = np_rng.permutation(len(sizes))
+            starts = np.zeros(len(sizes) + 1, dtype=np.int64)
+            np.cumsum(sizes[order], out=starts[1:])
+            unit_starts = np.empty(len(sizes), dtype=np.int64)
+            unit_starts[order] = starts[:-1]
+            total_records = int(starts[-1])
+            parents = np.full(total_records, -1, dtype=np.int32)
+            # the root of every unit but the first is attached to one of the records of the previous units
+            parents[starts[1:-1]] = (np_rng.random(len(sizes) - 1) * starts[1:-1]).astype(np.int32)
+        with stats.phase("random values"):
+            if self.dictionary is not None:
+                transaction_id = index if self.ids == "int" else values.random_id()
+                # integer records ids are numbered once sorted, see below
+                rids = np.empty(total_records, dtype=TransactionBatch.ID_DTYPE) if self.ids == "int" else values.take_bytes(total_records)
+                columns = self.dictionary.draw(np_rng, (total_records, len(self.attributes)))
+                stats.count("random values", columns.size)
+            elif self.ids == "int":
+                transaction_id = index
+                # records are numbered once sorted, see below
+                rids = np.empty(total_records, dtype=TransactionBatch.ID_DTYPE)
+                columns = values.take_bytes(total_records * len(self.attributes)).reshape(total_records, len(self.attributes))
+            else:
+                transaction_id = values.random_id()
+                records = values.take_bytes(total_records * (len(self.attributes) + 1)).reshape(total_records, len(self.attributes) + 1)
+                rids = records[:, 0]
+                columns = records[:, 1:]
+        with stats.phase("embedding"):
+            for pattern, start in zip(chosen_patterns, unit_starts[random_records:].tolist()):
+                end = start + len(pattern)
+                parents[start + 1:end] = pattern.parent_offsets[1:] + start
+                block = columns[start:end]
+                block[pattern.fixed_mask] = pattern.fixed_values[pattern.fixed_mask]
+        with stats.phase("assembly"):
+            embedded = np.stack([placed, unit_starts[random_records:]], axis=1)
+            tree = TransactionBatch.from_columns(self.attributes, transaction_id, rids, parents, columns, embedded, self.dictionary)
+        if self.ids == "int":
+            # integer ids are sequential in output order
+            tree.rids = np.arange(first_rid, first_rid + total_records, dtype=TransactionBatch.ID_DTYPE)
+        return tree
+
+    def extension(self, total_trees: int, stats: GenerationStats = None) -> "TransactionGenerator":
+        """
+        Create a generator of more transactions, following the ones of this generator, with the same field
+        names and patterns. Every pattern is embedded in about the same fraction of the new transactions as
+        of these ones, so the relative support of the patterns does not change and their absolute support only
+        grows. Transactions and shards are numbered after these ones: integer ids stay unique, and random
+        values come from new random streams
+        :param total_trees: number of new transactions
+        :param stats: where the time of every phase and the counters are collected. If None, new ones are created
+        :return: the generator of the new transactions
+        """
+        if total_trees < 1:
+            raise ValueError("There must be at least one tree. Given %d" % total_trees)
+        self.prepare()
+        extension = copy.copy(self)
+        extension.total_trees = total_trees
+        extension.shards = (total_trees + self.shard_size - 1) // self.shard_size
+        extension.first_tree = self.first_tree + self.total_trees
+        extension.first_shard = self.first_shard + self.shards
+        extension.stats = GenerationStats() if stats is None else stats
+        extension.stats.total_transactions = total_trees
+        extension.occurrences = np.rint(self.occurrences * (total_trees / self.total_trees)).astype(np.int64)
+        return extension
+
+    def generate_data(self, processes: int = 1) -> List[TransactionBatch]:
+        """
+        Generate all the transactions
+        :param processes: number of worker processes generating the transactions
+        :return: list of generated transactions
+        """
+        return list(self.iter_transactions(processes))
@@ -0,0 +1,102 @@
+from __future__ import absolute_import
+
+import json
+from typing import List, Dict, TextIO
+
+import numpy as np
+
+from models.tree import PatternTree, TransactionBatch
+
+
+class ManifestWriter:
+    """
+    Write the ground truth of a generation: a JSON file with the patterns and how many times each
+    one was embedded, and a CSV file with one line per embedding, giving the pattern index, the
+    transaction id and the record id of the root of the embedded pattern
+    """
+
+    def __init__(self, prefix: str, patterns: List[PatternTree], attributes: List[str], threshold: int) -> None:
+        """
+        Create the manifest files
+        :param prefix: name of the output, the files are prefix.manifest.json and prefix.occurrences.csv
+        :param patterns: the generated patterns
+        :param attributes: names of the fields, excluding tid, rid and parent
+        :param threshold: minimum number of times each pattern appears
+        """
+        self.manifest_file = prefix + ".manifest.json"
+        self.occurrences_file = prefix + ".occurrences.csv"
+        self.patterns = patterns
+        self.attributes = attributes
+        self.threshold = threshold
+        self.embeddings = np.zeros(len(patterns), dtype=np.int64)
+        self.transactions = np.zeros(len(patterns), dtype=np.int64)
+        self.file: TextIO = open(self.occurrences_file, "w")
+        self.file.write("pattern,transaction_id,record_id\n")
+
+    def write(self, tree: TransactionBatch) -> None:
+        """
+        Record the patterns embedded in a transaction
+        :param tree: the transaction, as produced by the generator
+        """
+        if tree.embedded is None or len(tree.embedded) == 0:
+            return
+        tid = str(tree.tid)
+        self.file.write("".join("%d,%s,%s\n" % (pattern, tid, tree.rid_of(row)) for pattern, row in tree.embedded.tolist()))
+        np.add.at(self.embeddings, tree.embedded[:, 0], 1)
+        self.transactions[np.unique(tree.embedded[:, 0])] += 1
+
+    def close(self) -> None:
+        """
+        Close the occurrences and write the manifest
+        """
+        self.file.close()
+        manifest = {"attributes": self.attributes, "threshold": self.threshold, "occurrences": self.occurrences_file,
+                    "patterns": [{"nodes": pattern_to_nodes(pattern), "embeddings": int(self.embeddings[index]),
+                                  "transactions": int(self.transactions[index])}
+                                 for index, pattern in enumerate(self.patterns)]}
+        with open(self.manifest_file, "w") as file:
+            json.dump(manifest, file, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def pattern_to_nodes(pattern: PatternTree) -> List[Dict]:
+    """
+    Flatten a pattern
+    :param pattern: root of the pattern
+    :return: its nodes in pre-order, each with its fields and the position of its parent (-1 for the root)
+    """
+    nodes = pattern.get_nodes_list()
+    positions = {id(node): position for position, node in enumerate(nodes)}
+    flat = [{"fields": dict(node.fields), "parent": -1} for node in nodes]
+    for position, node in enumerate(nodes):
+        for child in node.children:
+            flat[positions[id(child)]]["parent"] = position
+    return flat
+
+
+def nodes_to_pattern(nodes: List[Dict]) -> PatternTree:
+    """
+    Rebuild a pattern flattened by pattern_to_nodes
+    :param nodes: the nodes in pre-order, each with its fields and the position of its parent
+    :return: the root of the pattern
+    """
+    trees = [PatternTree(dict(node["fields"])) for node in nodes]
+    for tree, node in zip(trees, nodes):
+        if node["parent"] >= 0:
+            trees[node["parent"]].add_child(tree)
+    return trees[0]
+
+
+def load_manifest(path: str) -> Dict:
+    """
+    Read a manifest written by ManifestWriter
+    :param path: the manifest file
+    :return: the manifest, with the patterns as flat lists of nodes
+    """
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,115 @@
+from __future__ import absolute_import
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from logic.writer import format_csv_chunk
+from models.tree import TransactionBatch
+
+
+class PipelinedWriter:
+    """
+    Run a writer in a background thread, fed through a bounded queue, so that compression and disk
+    writes (which release the GIL) overlap with the generation of the next transactions. When the queue
+    is full, write blocks until the writer catches up, so memory is bounded by the capacity of the queue.
+    Formatting the CSV lines holds the GIL, so in the writing thread it still competes with the generation:
+    with formatters, the lines are rendered by that number of processes instead, in chunks of CHUNK_SIZE
+    transactions, and the writing thread only passes them to the writer
+    """
+
+    # marks the end of the transactions in the queue
+    _END = None
+    # number of transactions sent to a formatting process at once
+    CHUNK_SIZE = 16
+
+    def __init__(self, writer, capacity: int = 64, formatters: int = 0) -> None:
+        """
+        Start the writing thread
+        :param writer: the wrapped writer, with write and close methods. It is only used by the writing thread
+        :param capacity: maximum number of transactions waiting to be written
+        :param formatters: number of processes rendering the CSV lines, 0 to render them in the writing thread.
+        With formatters, the writer must be a CsvWriter
+        """
+        if capacity < 1:
+            raise ValueError("The queue must hold at least one transaction. Given %d" % capacity)
+        if formatters < 0:
+            raise ValueError("The number of formatting processes cannot be negative. Given %d" % formatters)
+        self.writer = writer
+        self.formatters = formatters
+        self.queue: queue.Queue = queue.Queue(maxsize=capacity)
+        self.error: BaseException = None
+        # set when the writing thread has taken the end mark from the queue
+        self.ended = False
+        self.thread = threading.Thread(target=self._run, name="writer", daemon=True)
+        self.thread.start()
+
+    def _next(self) -> TransactionBatch:
+        tree = self.queue.get()
+        if tree is self._END:
+            self.ended = True
+        return tree
+
+    def _run(self) -> None:
+        try:
+            if self.formatters > 0:
+                self._run_formatters()
+            else:
+                while True:
+                    tree = self._next()
+                    if tree is self._END:
+                        break
+                    self.writer.write(tree)
+            self.writer.close()
+        except BaseException as error:
+            self.error = error
+            # keep draining, so that the producer is never blocked on a full queue
+            while not self.ended:
+                self._next()
+
+    def _run_formatters(self) -> None:
+        with ProcessPoolExecutor(self.formatters) as executor:
+            # chunks being formatted, in order, bounded so that memory does not grow with the output
+            pending = deque()
+            chunk = []
+            while not self.ended:
+                tree = self._next()
+                if tree is not self._END:
+                    chunk.append(tree)
+                if len(chunk) >= self.CHUNK_SIZE or (self.ended and len(chunk) > 0):
+                    pending.append((chunk, executor.submit(format_csv_chunk, chunk)))
+                    chunk = []
+                while len(pending) > (0 if self.ended else 2 * self.formatters):
+                    trees, future = pending.popleft()
+                    for tree, text in zip(trees, future.result()):
+                        self.writer.write(tree, text)
+
+    def _check(self) -> None:
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def write(self, tree: TransactionBatch) -> None:
+        """
+        Queue a transaction, waiting if the queue is full
+        :param tree: the transaction
+        """
+        self._check()
+        self.queue.put(tree)
+
+    def close(self) -> None:
+        """
+        Wait until all the queued transactions are written and close the wrapped writer.
+        Errors of the writing thread are raised here, if not already raised by write
+        """
+        if self.thread.is_alive():
+            self.queue.put(self._END)
+            self.thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
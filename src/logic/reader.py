@@ -0,0 +1,173 @@
+from __future__ import absolute_import
+
+import json
+import mmap
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from logic.writer import ColumnarWriter, CsvWriter
+from models.tree import TransactionBatch
+
+
+class ColumnarDataset:
+    """
+    A dataset written by ColumnarWriter. Every column is opened with np.memmap, so nothing is read
+    or copied until it is accessed. Dictionary-encoded field columns hold codes, decoded when a
+    transaction is loaded
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Open a dataset
+        :param directory: directory of the dataset
+        """
+        with open(os.path.join(directory, ColumnarWriter.META_FILE)) as file:
+            meta = json.load(file)
+        self.directory = directory
+        self.attributes = meta["attributes"]
+        self.records: int = meta["records"]
+        self.transactions: int = meta["transactions"]
+        self.columns: Dict[str, np.memmap] = {}
+        for name, dtype in meta["columns"].items():
+            length = self.transactions if name == "tid" else self.records
+            if length == 0:
+                # an empty file cannot be mapped
+                self.columns[name] = np.zeros(0, dtype=np.dtype(dtype))
+                continue
+            self.columns[name] = np.memmap(os.path.join(directory, name + ".bin"), dtype=np.dtype(dtype), mode="r", shape=(length,))
+        # values of every field, if the dataset is dictionary-encoded
+        self.cardinality: int = meta.get("cardinality")
+        self.dictionaries: List[np.memmap] = None
+        if self.cardinality is not None:
+            self.dictionaries = [np.memmap(os.path.join(directory, ColumnarWriter.field_column(column) + ".dict.bin"),
+                                           dtype=TransactionBatch.VALUE_DTYPE, mode="r", shape=(self.cardinality,))
+                                 for column in range(len(self.attributes))]
+
+    def __len__(self) -> int:
+        return self.records
+
+    def field(self, attribute: str) -> np.memmap:
+        """
+        Get the column of an attribute
+        :param attribute: name of the attribute
+        :return: the values of the attribute, one per record, or their codes if the dataset is dictionary-encoded
+        """
+        return self.columns[ColumnarWriter.field_column(self.attributes.index(attribute))]
+
+    def get_transaction(self, transaction: int) -> TransactionBatch:
+        """
+        Load a single transaction
+        :param transaction: ordinal of the transaction in the dataset
+        :return: the transaction
+        """
+        if not 0 <= transaction < self.transactions:
+            raise IndexError("Transaction %d out of range: the dataset has %d" % (transaction, self.transactions))
+        codes = self.columns["transaction"]
+        start = int(np.searchsorted(codes, transaction, side="left"))
+        end = int(np.searchsorted(codes, transaction, side="right"))
+        parents = np.array(self.columns["parent"][start:end], dtype=np.int32)
+        parents[parents >= 0] -= start
+        values = np.empty((end - start, len(self.attributes)), dtype=TransactionBatch.VALUE_DTYPE)
+        for column in range(len(self.attributes)):
+            stored = self.columns[ColumnarWriter.field_column(column)][start:end]
+            values[:, column] = stored if self.dictionaries is None else self.dictionaries[column][stored]
+        tid = self.columns["tid"][transaction]
+        tid = int(tid) if self.columns["tid"].dtype.kind == "i" else tid.tobytes().hex()
+        return TransactionBatch(self.attributes, tid, np.array(self.columns["rid"][start:end]), parents, values)
+
+
+class IndexedCsv:
+    """
+    A CSV output written by CsvWriter with an index. The index is memory-mapped and every part file
+    is opened with mmap, so a transaction is read with a single lookup, without parsing the rest of
+    the output
+    """
+
+    def __init__(self, prefix: str) -> None:
+        """
+        Open an indexed output
+        :param prefix: name of the output without extension, as given to CsvWriter
+        """
+        with open(prefix + ".index.json") as file:
+            description = json.load(file)
+        directory = os.path.dirname(prefix)
+        self.paths: List[str] = [os.path.join(directory, part) for part in description["parts"]]
+        self.transactions: int = description["transactions"]
+        self.entries: np.ndarray = np.zeros(0, dtype=CsvWriter.INDEX_DTYPE + [("tid", "<i8")])
+        if self.transactions > 0:
+            dtype = np.dtype([tuple(field) for field in description["dtype"]])
+            self.entries = np.memmap(prefix + ".index", dtype=dtype, mode="r", shape=(self.transactions,))
+        self.maps: Dict[int, mmap.mmap] = {}
+        # ordinal of every transaction id, built on the first lookup by id
+        self.ordinals: Dict = None
+
+    def __len__(self) -> int:
+        return self.transactions
+
+    def _map(self, part: int) -> mmap.mmap:
+        if part not in self.maps:
+            with open(self.paths[part], "rb") as file:
+                self.maps[part] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.maps[part]
+
+    def get_text(self, transaction: int) -> str:
+        """
+        Read the lines of a transaction
+        :param transaction: ordinal of the transaction in the output
+        :return: its lines, as written
+        """
+        if not 0 <= transaction < self.transactions:
+            raise IndexError("Transaction %d out of range: the output has %d" % (transaction, self.transactions))
+        entry = self.entries[transaction]
+        offset = int(entry["offset"])
+        return self._map(int(entry["part"]))[offset:offset + int(entry["size"])].decode("ascii")
+
+    def get_transaction(self, transaction: int) -> List[List[str]]:
+        """
+        Read a transaction
+        :param transaction: ordinal of the transaction in the output
+        :return: its records, each one as the list of its values: tid, rid, parent id, then the attributes
+        """
+        return [line.split(",") for line in self.get_text(transaction).splitlines()]
+
+    def find(self, tid) -> int:
+        """
+        Find a transaction by id
+        :param tid: the transaction id, a hex string or an int
+        :return: the ordinal of the transaction
+        """
+        if self.ordinals is None:
+            tids = self.entries["tid"]
+            keys = tids.tolist() if tids.dtype.kind == "i" else [tid.hex() for tid in tids.tolist()]
+            self.ordinals = {key: ordinal for ordinal, key in enumerate(keys)}
+        if tid not in self.ordinals:
+            raise KeyError("Transaction %s is not in the output" % tid)
+        return self.ordinals[tid]
+
+    def sample(self, count: int, seed: int = None) -> List[List[List[str]]]:
+        """
+        Read a uniform random sample of transactions, without replacement, in output order
+        :param count: number of transactions
+        :param seed: seed of the sample. If None, a random seed is used
+        :return: the records of every sampled transaction
+        """
+        if not 0 <= count <= self.transactions:
+            raise ValueError("The sample must have between 0 and %d transactions. Given %d" % (self.transactions, count))
+        ordinals = np.sort(np.random.default_rng(seed).choice(self.transactions, size=count, replace=False))
+        return [self.get_transaction(ordinal) for ordinal in ordinals.tolist()]
+
+    def close(self) -> None:
+        """
+        Unmap the part files
+        """
+        for part in self.maps.values():
+            part.close()
+        self.maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
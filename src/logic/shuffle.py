@@ -0,0 +1,77 @@
+from __future__ import absolute_import
+
+import os
+import pickle
+import random
+import shutil
+import tempfile
+from typing import List, BinaryIO, Iterator
+
+from models.tree import TransactionBatch
+
+
+class ExternalShuffle:
+    """
+    Shuffle transactions that do not fit in memory. Every transaction is appended to a temporary
+    bucket file chosen uniformly at random; then each bucket is loaded, shuffled in memory and
+    emitted in turn. This gives a uniform permutation, reading and writing every file sequentially,
+    with memory bounded by the size of a bucket
+    """
+
+    # write buffer of every bucket file
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, buckets: int, seed: int = None, directory: str = None) -> None:
+        """
+        Create the temporary bucket files
+        :param buckets: number of bucket files. Memory usage is about the output size divided by this
+        :param seed: seed of the shuffle. If None, a random seed is used
+        :param directory: where the temporary files are created. If None, the default temporary directory
+        """
+        if buckets < 1:
+            raise ValueError("There must be at least one bucket. Given %d" % buckets)
+        self.rng = random.Random(seed)
+        self.directory = tempfile.mkdtemp(prefix="shuffle-", dir=directory)
+        self.paths: List[str] = [os.path.join(self.directory, "bucket-%05d" % bucket) for bucket in range(buckets)]
+        self.files: List[BinaryIO] = [open(path, "wb", buffering=self.BUFFER_SIZE) for path in self.paths]
+        self.sizes: List[int] = [0] * buckets
+
+    def add(self, tree: TransactionBatch) -> None:
+        """
+        Scatter a transaction to a random bucket
+        :param tree: the transaction
+        """
+        bucket = self.rng.randrange(len(self.files))
+        pickle.dump(tree, self.files[bucket], pickle.HIGHEST_PROTOCOL)
+        self.sizes[bucket] += 1
+
+    def __iter__(self) -> Iterator[TransactionBatch]:
+        """
+        Emit the shuffled transactions, one bucket at a time. Temporary files are removed while reading
+        :return: an iterator over all the added transactions, in random order
+        """
+        try:
+            for file in self.files:
+                file.close()
+            for path, size in zip(self.paths, self.sizes):
+                with open(path, "rb") as file:
+                    trees = [pickle.load(file) for _ in range(size)]
+                os.remove(path)
+                self.rng.shuffle(trees)
+                yield from trees
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Remove the temporary files
+        """
+        for file in self.files:
+            file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
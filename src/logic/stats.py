@@ -0,0 +1,101 @@
+from __future__ import absolute_import
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+
+class GenerationStats:
+    """
+    Instrumentation of a generation: wall time spent in every phase, counters, and a callback
+    notified periodically while transactions are produced and once at the end
+    """
+
+    def __init__(self, callback: Callable[["GenerationStats"], None] = None, interval: float = 5.0) -> None:
+        """
+        Create empty statistics
+        :param callback: function called with the statistics every interval seconds and when the generation ends
+        :param interval: minimum number of seconds between two progress notifications
+        """
+        self.callback = callback
+        self.interval = interval
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.total_transactions = 0
+        self.finished = False
+        self.start = time.perf_counter()
+        self.last_notification = self.start
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Add the time spent in the with block to a phase. Phases can be entered many times
+        :param name: name of the phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Increment a counter
+        :param name: name of the counter
+        :param amount: increment
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, other: "GenerationStats") -> None:
+        """
+        Add the phases and counters of other statistics, e.g. the ones of a worker process
+        :param other: the statistics to be added
+        """
+        for name, duration in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+        for name, amount in other.counters.items():
+            self.count(name, amount)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def records_per_second(self) -> float:
+        return self.counters.get("records", 0) / max(self.elapsed(), 1e-9)
+
+    def progress(self) -> None:
+        """
+        Notify the callback, if enough time passed since the last notification
+        """
+        now = time.perf_counter()
+        if self.callback is not None and now - self.last_notification >= self.interval:
+            self.last_notification = now
+            self.callback(self)
+
+    def finish(self) -> None:
+        """
+        Mark the generation as ended and notify the callback
+        """
+        self.finished = True
+        if self.callback is not None:
+            self.callback(self)
+
+    def report(self) -> str:
+        """
+        Describe the statistics
+        :return: a multi-line description of phases, counters and throughput
+        """
+        lines = ["Phase                          time [s]"]
+        for name, duration in self.phases.items():
+            lines.append("%-30s %9.3f" % (name, duration))
+        lines.append("Counters:")
+        for name, amount in self.counters.items():
+            lines.append("  %-28s %9d" % (name, amount))
+        lines.append("Wall time %.3f s, %.0f records/s" % (self.elapsed(), self.records_per_second()))
+        lines.append("Phases executed by worker processes are summed over the processes")
+        return "\n".join(lines)
+
+    def __getstate__(self) -> Dict:
+        # the callback belongs to the process that created the statistics
+        state = dict(self.__dict__)
+        state["callback"] = None
+        return state
@@ -1,26 +1,225 @@
 from __future__ import absolute_import
 
-import uuid
-from typing import List
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+
+class ValuePool:
+    """
+    Seedable source of random strings. Values are generated in bulk, hex-encoding one large
+    random byte buffer, and served one at a time until the pool has to be refilled
+    """
+
+    # number of bytes of every value, i.e. 32 hex characters like a uuid
+    VALUE_BYTES = 16
+
+    def __init__(self, seed: int = None, batch_size: int = 16384) -> None:
+        """
+        Create a pool of random strings
+        :param seed: seed of the random values. If None, a random seed is used
+        :param batch_size: number of values generated at every refill
+        """
+        if batch_size < 1:
+            raise ValueError("The batch size must be at least 1. Given %d" % batch_size)
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.values: List[str] = []
+        self.position = 0
+        # number of random values served so far, excluding the ones generated but still in the pool
+        self.served = 0
+
+    def _refill(self, minimum: int) -> None:
+        """
+        Generate a new batch of values, keeping the ones not served yet
+        :param minimum: number of values that must be available after the refill
+        """
+        available = len(self.values) - self.position
+        count = max(self.batch_size, minimum - available)
+        width = 2 * self.VALUE_BYTES
+        text = self.rng.bytes(self.VALUE_BYTES * count).hex()
+        self.values = self.values[self.position:] + [text[i:i + width] for i in range(0, len(text), width)]
+        self.position = 0
+
+    def random_string(self) -> str:
+        """
+        Get a random string from the pool
+        :return: a random string
+        """
+        if self.position == len(self.values):
+            self._refill(1)
+        value = self.values[self.position]
+        self.position += 1
+        self.served += 1
+        return value
+
+    def random_id(self) -> str:
+        """
+        Get a random string drawn on its own, without refilling the pool: cheaper for the few values
+        of a kind, e.g. one transaction id per tree or the field names
+        :return: a random string
+        """
+        self.served += 1
+        return self.rng.bytes(self.VALUE_BYTES).hex()
+
+    def take_bytes(self, count: int) -> np.ndarray:
+        """
+        Get many random values at once as binary data, without hex-encoding them
+        :param count: number of values
+        :return: a writable array of count values of VALUE_BYTES bytes each
+        """
+        self.served += count
+        return np.frombuffer(bytearray(self.rng.bytes(self.VALUE_BYTES * count)), dtype=np.dtype((np.void, self.VALUE_BYTES)))
+
+    def take(self, count: int) -> List[str]:
+        """
+        Get many random strings from the pool at once
+        :param count: number of strings
+        :return: the list of random strings
+        """
+        if self.position + count > len(self.values):
+            self._refill(count)
+        values = self.values[self.position:self.position + count]
+        self.position += count
+        self.served += count
+        return values
+
+
+class ValueDictionary:
+    """
+    Finite domain of the values of every field: field i takes one of cardinality random values, drawn
+    with a Zipf distribution of the given skew (0 for uniform), so that value k is about (k + 1)^skew
+    times rarer than the first one. Records store the small integer code of each value, and the
+    16-byte values are only looked up when the records are rendered.
+    Dictionaries are rebuilt from their parameters when unpickled, once per process, so that the
+    transactions sent to other processes or to disk do not carry a copy of them
+    """
+
+    def __init__(self, fields: int, cardinality: int, skew: float = 0.0, seed: int = None) -> None:
+        """
+        Create the values of every field
+        :param fields: number of fields
+        :param cardinality: number of distinct values of every field
+        :param skew: exponent of the Zipf distribution of the values, 0 for uniform
+        :param seed: seed of the values. If None, a random seed is chosen and stored in self.seed
+        """
+        if cardinality < 1:
+            raise ValueError("A field must have at least one value. Given %d" % cardinality)
+        if skew < 0:
+            raise ValueError("The skew cannot be negative. Given %f" % skew)
+        self.fields = fields
+        self.cardinality = cardinality
+        self.skew = skew
+        self.seed: int = np.random.SeedSequence().entropy if seed is None else seed
+        self.values = ValuePool(self.seed).take_bytes(fields * cardinality).reshape(fields, cardinality)
+        # smallest unsigned integer type holding every code
+        self.code_dtype = np.min_scalar_type(cardinality - 1)
+        self.cumulative: np.ndarray = None
+        if skew > 0:
+            weights = np.arange(1, cardinality + 1, dtype=np.float64) ** -skew
+            self.cumulative = np.cumsum(weights / weights.sum())
+        # codes of the values rendered by value, per field
+        self.interned: List[Dict[str, int]] = [{} for _ in range(fields)]
+        # values of every field in sorted order and their codes, built by code on the first lookup of a field
+        self.sorted_values: List[np.ndarray] = [None] * fields
+        self.sorted_codes: List[np.ndarray] = [None] * fields
+
+    def __reduce__(self):
+        return shared_dictionary, (self.fields, self.cardinality, self.skew, self.seed)
+
+    def draw(self, rng: np.random.Generator, shape) -> np.ndarray:
+        """
+        Draw random codes
+        :param rng: random number generator to use
+        :param shape: shape of the array of codes
+        :return: the codes
+        """
+        if self.cumulative is None:
+            return rng.integers(0, self.cardinality, size=shape, dtype=self.code_dtype)
+        codes = np.searchsorted(self.cumulative, rng.random(shape), side="right")
+        return np.minimum(codes, self.cardinality - 1).astype(self.code_dtype)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Look up the values of rows of codes
+        :param codes: one column per field
+        :return: the 16-byte values, with the same shape
+        """
+        return self.values[np.arange(self.fields), codes]
+
+    def value(self, field: int, code: int) -> str:
+        """
+        Get a value as a string, remembering its code
+        :param field: index of the field
+        :param code: code of the value
+        :return: the value, a 32-character hex string
+        """
+        value = self.values[field, code].tobytes().hex()
+        self.interned[field][value] = code
+        return value
+
+    def code(self, field: int, value: str) -> int:
+        """
+        Get the code of a value
+        :param field: index of the field
+        :param value: the value, a 32-character hex string
+        :return: its code
+        """
+        code = self.interned[field].get(value)
+        if code is None:
+            if self.sorted_codes[field] is None:
+                # one sort per field, then every value is found with a binary search
+                self.sorted_codes[field] = np.argsort(self.values[field], kind="stable")
+                self.sorted_values[field] = self.values[field][self.sorted_codes[field]]
+            key = np.array([bytes.fromhex(value)], dtype=self.values.dtype)
+            position = int(np.searchsorted(self.sorted_values[field], key)[0])
+            if position == self.cardinality or self.sorted_values[field][position] != key[0]:
+                raise ValueError("Value %s is not in the dictionary of field %d" % (value, field))
+            code = int(self.sorted_codes[field][position])
+            self.interned[field][value] = code
+        return code
+
+
+# dictionaries already built in this process, by parameters
+_dictionaries: Dict[Tuple, ValueDictionary] = {}
+
+
+def shared_dictionary(fields: int, cardinality: int, skew: float, seed: int) -> ValueDictionary:
+    """
+    Get the dictionary with the given parameters, building it only the first time in this process
+    :param fields: number of fields
+    :param cardinality: number of distinct values of every field
+    :param skew: exponent of the Zipf distribution of the values, 0 for uniform
+    :param seed: seed of the values
+    :return: the dictionary
+    """
+    key = (fields, cardinality, skew, seed)
+    if key not in _dictionaries:
+        _dictionaries[key] = ValueDictionary(fields, cardinality, skew, seed)
+    return _dictionaries[key]
+
+
+# pool used when no explicit one is given
+_default_pool = ValuePool()
 
 
 class ValueGenerator:
     @staticmethod
-    def random_string() -> str:
+    def random_string(values: ValuePool = None) -> str:
         """
         Generate a random string
+        :param values: pool from which the string is drawn. If None, an unseeded pool is used
         :return: a random string
         """
-        return str(uuid.uuid4().hex)
+        return (_default_pool if values is None else values).random_string()
 
     @staticmethod
-    def generate_field_names(number_of_fields: int) -> List[str]:
+    def generate_field_names(number_of_fields: int, values: ValuePool = None) -> List[str]:
         """
         Generate the names of the various fields
         :param number_of_fields: number of fields to be generated
+        :param values: pool from which the names are drawn. If None, an unseeded pool is used
         :return: the list of names of the fields
         """
-        fields = []
-        for _ in range(number_of_fields):
-            fields.append(ValueGenerator.random_string())
-        return fields
+        values = _default_pool if values is None else values
+        return [values.random_id() for _ in range(number_of_fields)]
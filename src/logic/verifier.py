@@ -0,0 +1,136 @@
+from __future__ import absolute_import
+
+import gzip
+import lzma
+from array import array
+from typing import List, Dict, Set, Tuple, TextIO
+
+import numpy as np
+
+from models.tree import group_children
+
+
+def open_csv(path: str) -> TextIO:
+    """
+    Open a CSV output, compressed or not
+    :param path: the file, compressed if its extension is .gz or .xz
+    :return: the file opened in text mode
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    if path.endswith(".xz"):
+        return lzma.open(path, "rt")
+    return open(path)
+
+
+class PatternVerifier:
+    """
+    Count the true support of patterns in a CSV dataset. The dataset is read once, indexing only
+    the (field, value) pairs that appear in some pattern, so that the candidate roots of a pattern
+    are found by intersecting posting lists; each candidate is then matched against the pattern.
+    A record matches a pattern node if it has all the fields of the node (none for <Anything>
+    nodes), and the children of the node must match distinct children of the record.
+    Records of a transaction must be contiguous, as they are in the output of the generator
+    """
+
+    def __init__(self, patterns: List[List[Dict]]) -> None:
+        """
+        Prepare the verification of the patterns
+        :param patterns: every pattern as a list of nodes in pre-order, each with its fields and the position
+        of its parent, like in the manifest
+        """
+        self.patterns = patterns
+        self.pattern_children: List[List[List[int]]] = []
+        for nodes in patterns:
+            children = [[] for _ in nodes]
+            for position, node in enumerate(nodes):
+                if node["parent"] >= 0:
+                    children[node["parent"]].append(position)
+            self.pattern_children.append(children)
+        # rows having each (field, value) pair of the patterns
+        self.postings: Dict[str, Dict[str, Set[int]]] = {}
+        for nodes in patterns:
+            for node in nodes:
+                for field, value in node["fields"].items():
+                    self.postings.setdefault(field, {}).setdefault(value, set())
+        self.records = 0
+        self.transactions: np.ndarray = None
+        self.children: Tuple[np.ndarray, np.ndarray] = None
+
+    def load(self, paths: List[str]) -> None:
+        """
+        Read the dataset
+        :param paths: the CSV files, e.g. all the part files of an output
+        """
+        transactions = array("q")
+        parents = array("q")
+        transaction = -1
+        tid = None
+        rows: Dict[str, int] = {}
+        for path in paths:
+            with open_csv(path) as file:
+                header = file.readline().rstrip("\n").split(",")
+                indexed = [(column, self.postings[field]) for column, field in enumerate(header) if field in self.postings]
+                for line in file:
+                    values = line.rstrip("\n").split(",")
+                    if values[0] != tid:
+                        tid = values[0]
+                        transaction += 1
+                        rows = {}
+                    row = self.records
+                    rows[values[1]] = row
+                    transactions.append(transaction)
+                    parents.append(-1 if values[2] == "None" else rows[values[2]])
+                    for column, postings in indexed:
+                        matching = postings.get(values[column])
+                        if matching is not None:
+                            matching.add(row)
+                    self.records += 1
+        self.transactions = np.frombuffer(transactions, dtype=np.int64)
+        self.children = group_children(np.frombuffer(parents, dtype=np.int64))
+
+    def _children_of(self, row: int) -> List[int]:
+        order, offsets = self.children
+        return order[offsets[row + 1]:offsets[row + 2]].tolist()
+
+    def _matches(self, pattern: int, node: int, row: int) -> bool:
+        """
+        Check if a record matches a pattern node and its subtree
+        """
+        for field, value in self.patterns[pattern][node]["fields"].items():
+            if row not in self.postings[field][value]:
+                return False
+        return self._assign(pattern, self.pattern_children[pattern][node], 0, self._children_of(row), set())
+
+    def _assign(self, pattern: int, nodes: List[int], index: int, rows: List[int], used: Set[int]) -> bool:
+        """
+        Check if the pattern nodes from index on can be matched to distinct unused rows
+        """
+        if index == len(nodes):
+            return True
+        for row in rows:
+            if row not in used and self._matches(pattern, nodes[index], row):
+                used.add(row)
+                if self._assign(pattern, nodes, index + 1, rows, used):
+                    return True
+                used.discard(row)
+        return False
+
+    def count(self, pattern: int) -> Tuple[int, int]:
+        """
+        Count the occurrences of a pattern
+        :param pattern: index of the pattern
+        :return: the number of records at which the pattern is rooted, and the number of transactions containing it
+        """
+        root = self.patterns[pattern][0]["fields"]
+        if len(root) > 0:
+            candidates = set.intersection(*sorted((self.postings[field][value] for field, value in root.items()), key=len))
+        else:
+            candidates = range(self.records)
+        occurrences = 0
+        transactions = set()
+        for row in candidates:
+            if self._matches(pattern, 0, row):
+                occurrences += 1
+                transactions.add(int(self.transactions[row]))
+        return occurrences, len(transactions)
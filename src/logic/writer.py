@@ -0,0 +1,264 @@
+from __future__ import absolute_import
+
+import gzip
+import json
+import lzma
+import os
+import struct
+from typing import List, Dict, BinaryIO, Tuple
+
+import numpy as np
+
+from logic.values import ValueDictionary
+from models.tree import TransactionBatch
+
+
+def format_csv(tree: TransactionBatch) -> str:
+    """
+    Render the records of a transaction as CSV lines, as written by CsvWriter
+    :param tree: the transaction
+    :return: one line per record, each ended by a newline
+    """
+    return "".join(",".join(row) + "\n" for row in tree.to_rows())
+
+
+def format_csv_chunk(trees: List[TransactionBatch]) -> List[str]:
+    """
+    Render several transactions, e.g. in another process, so that a single message carries them
+    :param trees: the transactions
+    :return: the CSV lines of every transaction
+    """
+    return [format_csv(tree) for tree in trees]
+
+
+class ColumnarWriter:
+    """
+    Write transactions in a binary columnar layout: a directory with one raw file per column, that
+    can be memory-mapped without parsing, and a meta.json describing the columns.
+    Ids and values are stored as their 16 bytes, or ids as int64 with integer ids, transactions as
+    integer codes into the tid column and parents as the row of the parent record (-1 for roots).
+    With a dictionary, the field columns hold the codes of the values, and the values of field i are
+    written once in field_i.dict.bin
+    """
+
+    META_FILE = "meta.json"
+    # write buffer of every column file
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, directory: str, attributes: List[str], ids: str = "hex", dictionary: ValueDictionary = None) -> None:
+        """
+        Create the dataset directory and its column files
+        :param directory: directory of the dataset, created if it does not exist
+        :param attributes: names of the fields, excluding tid, rid and parent
+        :param ids: "hex" for 16-byte ids, "int" for 64-bit integer ids
+        :param dictionary: if set, the dictionary of the values of the transactions, which are written as codes
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.attributes = attributes
+        self.records = 0
+        self.transactions = 0
+        id_dtype = "<i8" if ids == "int" else TransactionBatch.VALUE_DTYPE.str
+        self.dtypes: Dict[str, str] = {"tid": id_dtype, "transaction": "<i8", "rid": id_dtype, "parent": "<i8"}
+        value_dtype = TransactionBatch.VALUE_DTYPE.str if dictionary is None else dictionary.code_dtype.newbyteorder("<").str
+        for column in range(len(attributes)):
+            self.dtypes[ColumnarWriter.field_column(column)] = value_dtype
+        self.cardinality = None
+        if dictionary is not None:
+            self.cardinality = dictionary.cardinality
+            for column in range(len(attributes)):
+                with open(os.path.join(directory, ColumnarWriter.field_column(column) + ".dict.bin"), "wb") as file:
+                    file.write(dictionary.values[column].tobytes())
+        self.files: Dict[str, BinaryIO] = {name: open(os.path.join(directory, name + ".bin"), "wb", buffering=self.BUFFER_SIZE)
+                                           for name in self.dtypes}
+
+    @staticmethod
+    def field_column(column: int) -> str:
+        """
+        Name of the column of an attribute
+        :param column: index of the attribute
+        :return: the name of the column
+        """
+        return "field_%d" % column
+
+    def write(self, tree: TransactionBatch) -> None:
+        """
+        Append a transaction to the dataset
+        :param tree: the transaction
+        """
+        self.files["tid"].write(np.array([tree.tid], dtype=self.dtypes["tid"]).tobytes() if isinstance(tree.tid, int) else bytes.fromhex(tree.tid))
+        self.files["transaction"].write(np.full(len(tree), self.transactions, dtype="<i8").tobytes())
+        self.files["rid"].write(tree.rids.astype(self.dtypes["rid"], copy=False).tobytes())
+        parents = tree.parents.astype("<i8")
+        parents[parents >= 0] += self.records
+        self.files["parent"].write(parents.tobytes())
+        for column in range(len(self.attributes)):
+            self.files[ColumnarWriter.field_column(column)].write(tree.values[:, column].astype(self.dtypes[ColumnarWriter.field_column(column)], copy=False).tobytes())
+        self.records += len(tree)
+        self.transactions += 1
+
+    def close(self) -> None:
+        """
+        Flush the column files and write the description of the dataset
+        """
+        for file in self.files.values():
+            file.close()
+        meta = {"attributes": self.attributes, "records": self.records, "transactions": self.transactions, "columns": self.dtypes,
+                "cardinality": self.cardinality}
+        with open(os.path.join(self.directory, self.META_FILE), "w") as file:
+            json.dump(meta, file, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class CsvWriter:
+    """
+    Write transactions as CSV, one line per record. Lines are accumulated in blocks written with a
+    single call, optionally compressed, and the output can be split into part files, each with its
+    own header, so that they can be loaded in parallel. Optionally, an index gives the part, byte offset,
+    size and number of rows of every transaction, so that it can be read without scanning the output
+    """
+
+    # file extension added by every compression
+    COMPRESSIONS = {"none": "", "gzip": ".gz", "lzma": ".xz"}
+    # number of characters accumulated before writing a block
+    BLOCK_SIZE = 1 << 20
+    # index entry of a transaction, followed by its id
+    INDEX_DTYPE = [("part", "<i4"), ("offset", "<i8"), ("size", "<i8"), ("rows", "<i8")]
+
+    def __init__(self, prefix: str, attributes: List[str], compression: str = "none", part_transactions: int = None, part_bytes: int = None,
+                 first_part: int = 0, append: bool = False, index: bool = False) -> None:
+        """
+        Create a CSV writer. Files are created when the first transaction is written
+        :param prefix: name of the output without extension. With parts, the files are prefix-00000.csv, prefix-00001.csv, ...
+        :param attributes: names of the fields, excluding tid, rid and parent
+        :param compression: one of none, gzip and lzma
+        :param part_transactions: if set, maximum number of transactions of every part file
+        :param part_bytes: if set, a new part file is started once a part reaches this uncompressed size
+        :param first_part: number of the first part file, e.g. the number of parts already written. Existing files are replaced
+        :param append: if true and the output is not split, the transactions are appended to the existing file. Compressed
+        output gets a new gzip member or xz stream, which decompressors read as a continuation of the file
+        :param index: if true, write the index of the transactions in prefix.index, described by prefix.index.json.
+        The output cannot be compressed, and it must be a new output
+        """
+        if compression not in self.COMPRESSIONS:
+            raise ValueError("Unknown compression %s, expected one of %s" % (compression, ", ".join(self.COMPRESSIONS)))
+        if part_transactions is not None and part_transactions < 1:
+            raise ValueError("A part must have at least one transaction. Given %d" % part_transactions)
+        if part_bytes is not None and part_bytes < 1:
+            raise ValueError("A part must have at least one byte. Given %d" % part_bytes)
+        if first_part < 0:
+            raise ValueError("The first part cannot be negative. Given %d" % first_part)
+        if index and (compression != "none" or append or first_part > 0):
+            raise ValueError("Only a new, uncompressed output can be indexed")
+        self.prefix = prefix
+        self.compression = compression
+        self.part_transactions = part_transactions
+        self.part_bytes = part_bytes
+        self.header = ",".join(["transaction_id", "record_id", "parent_id"] + attributes) + "\n"
+        self.first_part = first_part
+        self.append = append
+        self.parts: List[str] = []
+        # parts closed so far, and the number of transactions they contain. Both are replaced at once, so that
+        # another thread (e.g. the one of a PipelinedWriter) never sees one updated without the other
+        self.completed: Tuple[int, int] = (0, 0)
+        self.file: BinaryIO = None
+        self.index_file: BinaryIO = open(prefix + ".index", "wb", buffering=ColumnarWriter.BUFFER_SIZE) if index else None
+        self.index_dtype: np.dtype = None
+        self.index_format: struct.Struct = None
+        self.block: List[str] = []
+        self.block_size = 0
+        self.part_size = 0
+        self.part_count = 0
+
+    def _open_part(self) -> None:
+        split = self.part_transactions is not None or self.part_bytes is not None
+        name = ("%s-%05d" % (self.prefix, self.first_part + len(self.parts)) if split else self.prefix) + ".csv" + self.COMPRESSIONS[self.compression]
+        # the header is already in a file that is appended to
+        header = not (self.append and not split and os.path.exists(name) and os.path.getsize(name) > 0)
+        mode = "wb" if header else "ab"
+        if self.compression == "gzip":
+            self.file = gzip.open(name, mode)
+        elif self.compression == "lzma":
+            self.file = lzma.open(name, mode)
+        else:
+            self.file = open(name, mode)
+        self.parts.append(name)
+        self.part_size = 0
+        self.part_count = 0
+        if header:
+            self._append(self.header)
+
+    def _append(self, text: str) -> None:
+        self.block.append(text)
+        self.block_size += len(text)
+        self.part_size += len(text)
+        if self.block_size >= self.BLOCK_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if len(self.block) > 0:
+            self.file.write("".join(self.block).encode("ascii"))
+        self.block = []
+        self.block_size = 0
+
+    def _close_part(self) -> None:
+        self._flush()
+        self.file.close()
+        self.file = None
+        parts, transactions = self.completed
+        self.completed = (parts + 1, transactions + self.part_count)
+
+    def write(self, tree: TransactionBatch, text: str = None) -> None:
+        """
+        Write all the records of a transaction
+        :param tree: the transaction
+        :param text: the records already rendered by format_csv, e.g. by another process. If None, they are rendered here
+        """
+        if self.file is None:
+            self._open_part()
+        if text is None:
+            text = format_csv(tree)
+        if self.index_file is not None:
+            self._index(tree, text)
+        self._append(text)
+        self.part_count += 1
+        if (self.part_transactions is not None and self.part_count >= self.part_transactions) or \
+                (self.part_bytes is not None and self.part_size >= self.part_bytes):
+            self._close_part()
+
+    def _index(self, tree: TransactionBatch, text: str) -> None:
+        integer = isinstance(tree.tid, int)
+        if self.index_dtype is None:
+            # the type of the ids is known from the first transaction
+            self.index_dtype = np.dtype(self.INDEX_DTYPE + [("tid", "<i8" if integer else TransactionBatch.VALUE_DTYPE)])
+            self.index_format = struct.Struct("<iqqq" + ("q" if integer else "16s"))
+        self.index_file.write(self.index_format.pack(len(self.parts) - 1, self.part_size, len(text), len(tree),
+                                                     tree.tid if integer else bytes.fromhex(tree.tid)))
+
+    def close(self) -> None:
+        """
+        Write the pending block and close the current part, and the index. A new output without
+        transactions still gets a file with the header
+        """
+        if self.file is None and len(self.parts) == 0 and self.first_part == 0 and not self.append:
+            self._open_part()
+        if self.file is not None:
+            self._close_part()
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+            description = {"parts": [os.path.basename(part) for part in self.parts], "transactions": self.completed[1],
+                           "dtype": None if self.index_dtype is None else self.index_dtype.descr}
+            with open(self.prefix + ".index.json", "w") as file:
+                json.dump(description, file, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
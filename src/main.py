@@ -1,40 +1,212 @@
 from __future__ import absolute_import
 
+from logic.catalog import save_catalog, load_catalog
 from logic.generator import TransactionGenerator
+from logic.manifest import ManifestWriter
+from logic.pipeline import PipelinedWriter
+from logic.shuffle import ExternalShuffle
+from logic.stats import GenerationStats
+from logic.writer import ColumnarWriter, CsvWriter
 import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+from typing import Tuple
 import numpy as np
 
+
+def print_progress(progress: GenerationStats) -> None:
+    if not progress.finished:
+        print("%d/%d transactions, %d records, %.0f records/s" % (
+            progress.counters.get("transactions", 0), progress.total_transactions, progress.counters.get("records", 0),
+            progress.records_per_second()), file=sys.stderr)
+
+
+def node_argument(text: str) -> Tuple[int, int]:
+    node, _, nodes = text.partition("/")
+    if not node.isdigit() or not nodes.isdigit() or not 0 <= int(node) < int(nodes):
+        raise argparse.ArgumentTypeError("expected i/N with 0 <= i < N, given %s" % text)
+    return int(node), int(nodes)
+
+
+# options on which the order of the transactions and their part files depend, by destination. They are saved
+# in the checkpoint, so that -resume continues the same output
+ORDER_OPTIONS = {"stream": "-stream", "buckets": "-buckets", "part_transactions": "-part-t", "part_megabytes": "-part-mb",
+                 "compression": "-compress"}
+
+
+def write_checkpoint(path: str, args: argparse.Namespace, first_tree: int, transactions: int, parts: int, complete: bool) -> None:
+    checkpoint = {"catalog": args.catalog, "shard": args.shard, "first_tree": first_tree, "transactions": transactions,
+                  "parts": parts, "complete": complete}
+    checkpoint.update((option, getattr(args, option)) for option in ORDER_OPTIONS)
+    with open(path + ".tmp", "w") as file:
+        json.dump(checkpoint, file)
+    # replaced atomically, so that an interruption never leaves a partial checkpoint
+    os.replace(path + ".tmp", path)
+
+
 argument_parser = argparse.ArgumentParser(description="A data generator for frequent itemset mining in tree-like sequences of complex objects")
-argument_parser.add_argument("-out", dest="output", type=str, help="Output file name (csv format)", action="store", default="output")
+argument_parser.add_argument("-out", dest="output", type=str, help="Output file name (without extension for csv, a directory for bin)", action="store", default="output")
 argument_parser.add_argument("-t", dest="transactions", type=int, help="The number of transaction to generate (int)", action="store", default=20) #20
 argument_parser.add_argument("-p", dest="patterns", type=int, help="The number of patterns that will be generated and used (int)", action="store", default=4) #4
 argument_parser.add_argument("-avg", dest="average", type=float, help="The average length of a pattern (float)", action="store", default=3) #3
 argument_parser.add_argument("-nf", dest="fields", type=int, help="The total number of fields which every record will have (int)", action="store", default=10) #10
 argument_parser.add_argument("-thr", dest="threshold", type=int, help="The minimum number of times that each pattern will appear among all the transactions (int)", action="store", default=4) #4
 argument_parser.add_argument("-pp", dest="print", type=bool, help="Print the generated patterns (boolean)", action="store", default=False) #False
+argument_parser.add_argument("-stream", dest="stream", help="Write each transaction as soon as it is generated, without shuffling: memory does not grow with the number of transactions", action="store_true")
+argument_parser.add_argument("-j", dest="processes", type=int, help="The number of processes generating the transactions (int)", action="store", default=1)
+argument_parser.add_argument("-seed", dest="seed", type=int, help="The seed of the generation: the same seed gives the same output (int)", action="store", default=None)
+argument_parser.add_argument("-format", dest="format", type=str, help="The output format: csv, or bin for memory-mappable binary columns", action="store", choices=["csv", "bin"], default="csv")
+argument_parser.add_argument("-compress", dest="compression", type=str, help="Compression of the csv output", action="store", choices=["none", "gzip", "lzma"], default="none")
+argument_parser.add_argument("-part-t", dest="part_transactions", type=int, help="Split the csv output in part files of at most this number of transactions (int)", action="store", default=None)
+argument_parser.add_argument("-part-mb", dest="part_megabytes", type=float, help="Split the csv output in part files of about this uncompressed size in MB (float)", action="store", default=None)
+argument_parser.add_argument("-buckets", dest="buckets", type=int, help="Shuffle the transactions on disk through this number of temporary files, instead of in memory (int)", action="store", default=None)
+argument_parser.add_argument("-tmpdir", dest="tmpdir", type=str, help="Directory of the temporary files of -buckets. Default is the directory of the output", action="store", default=None)
+argument_parser.add_argument("-stats", "--stats", dest="stats", help="Print the progress and, at the end, the time of every phase and the counters on the standard error", action="store_true")
+argument_parser.add_argument("-ids", dest="ids", type=str, help="The ids of transactions and records: random hex strings, or sequential 64-bit integers", action="store", choices=["hex", "int"], default="hex")
+argument_parser.add_argument("-manifest", dest="manifest", help="Write the patterns and where each one was embedded in <out>.manifest.json and <out>.occurrences.csv", action="store_true")
+argument_parser.add_argument("-pipeline", dest="pipeline", type=int, help="Write in a background thread, fed through a queue of at most this number of transactions, while the next ones are generated (int)", action="store", default=None)
+argument_parser.add_argument("-formatters", dest="formatters", type=int, help="With -pipeline and a csv output, the number of processes rendering the csv lines, instead of the writing thread (int)", action="store", default=0)
+argument_parser.add_argument("-cardinality", dest="cardinality", type=int, help="Give every field this number of distinct values, stored as integer codes, instead of a new random value for every record (int)", action="store", default=None)
+argument_parser.add_argument("-skew", dest="skew", type=float, help="With -cardinality, exponent of the Zipf distribution of the values, 0 for uniform (float)", action="store", default=0.0)
+argument_parser.add_argument("-catalog", dest="catalog", type=str, help="Catalog of the generation (.npz): if it exists, its field names and patterns are used, otherwise it is created. Progress is saved in <out>.checkpoint.json", action="store", default=None)
+argument_parser.add_argument("-append", dest="append", help="Append -t more transactions, with the patterns of the catalog, to the output of the previous run", action="store_true")
+argument_parser.add_argument("-resume", dest="resume", help="Resume an interrupted run from <out>.checkpoint.json, after its last complete part file", action="store_true")
+argument_parser.add_argument("-shard", "--shard", dest="shard", type=str, help="Generate only the slice i/N of the transactions, with 0 <= i < N, to spread a dataset over N nodes with the same -seed or -catalog", action="store", default=None)
+argument_parser.add_argument("-index", dest="index", help="Write <out>.index with the part, byte offset and number of rows of every transaction, for random access to an uncompressed csv output", action="store_true")
 args = argument_parser.parse_args()
-output_file = args.output + ".csv"
+if args.index and (args.format != "csv" or args.compression != "none"):
+    argument_parser.error("-index needs an uncompressed csv output")
+if args.stream and (args.buckets is not None or args.tmpdir is not None):
+    argument_parser.error("-buckets and -tmpdir shuffle the transactions, they cannot be combined with -stream")
+if args.tmpdir is not None and args.buckets is None:
+    argument_parser.error("-tmpdir needs -buckets")
+if args.formatters > 0 and (args.pipeline is None or args.format != "csv"):
+    argument_parser.error("-formatters needs -pipeline and a csv output")
+if args.index and (args.append or args.resume):
+    argument_parser.error("-index cannot be combined with -append or -resume")
+node = None
+if args.shard is not None:
+    try:
+        node = node_argument(args.shard)
+    except argparse.ArgumentTypeError as error:
+        argument_parser.error("-shard: %s" % error)
+    if args.seed is None and (args.catalog is None or not os.path.exists(args.catalog)):
+        argument_parser.error("-shard needs a -seed or an existing -catalog, shared by all the nodes")
+    if args.append:
+        argument_parser.error("-append cannot be combined with -shard, append to the whole dataset from one node")
+if (args.append or args.resume) and args.format != "csv":
+    argument_parser.error("-append and -resume need the csv format")
+if (args.append or args.resume) and args.manifest:
+    argument_parser.error("-manifest cannot be combined with -append or -resume")
+if args.append and args.catalog is None:
+    argument_parser.error("-append needs the -catalog of the previous run")
+checkpoint_file = args.output + ".checkpoint.json"
 transactions = args.transactions
 patterns = args.patterns
 avg_pattern_length = args.average
 number_of_fields = args.fields
 threshold = args.threshold
 show = args.print
-generator = TransactionGenerator(transactions, patterns, avg_pattern_length, number_of_fields, threshold, show)
-trees = generator.generate_data()
-np.random.shuffle(trees)
-fields = []
-for field in [field for field in trees[0].fields]:
-    if field not in ["tid", "rid", "parent"]:
-        fields.append(field)
-file = open(output_file, "w")
-file.write("transaction_id,record_id,parent_id")
-for field in fields:
-    file.write("," + field)
-file.write("\n")
-for tree in trees:
-    for record in tree.get_nodes_list():
-        file.write(record.fields["tid"] + "," + record.fields["rid"] + "," + ("None" if record.fields["parent"] is None else record.fields["parent"]))
-        for field in fields:
-            file.write("," + record.fields[field])
-        file.write("\n")
+stats = GenerationStats(print_progress if args.stats else None)
+# index of the first transaction to write, after the ones already written in complete parts, and number of these parts
+start = 0
+first_part = 0
+if (args.resume or args.append) and not os.path.exists(checkpoint_file):
+    argument_parser.error("%s not found: -resume and -append need the checkpoint of a previous run with -catalog and the same -out" % checkpoint_file)
+if args.resume:
+    with open(checkpoint_file) as file:
+        checkpoint = json.load(file)
+    if checkpoint["complete"]:
+        argument_parser.error("The run of %s is already complete" % checkpoint_file)
+    args.catalog = checkpoint["catalog"]
+    args.shard = checkpoint["shard"]
+    node = None if args.shard is None else node_argument(args.shard)
+    for option, name in ORDER_OPTIONS.items():
+        if getattr(args, option) not in (argument_parser.get_default(option), checkpoint[option]):
+            argument_parser.error("%s must be the same as in the interrupted run, %s" % (name, checkpoint[option]))
+        setattr(args, option, checkpoint[option])
+    if args.part_transactions is None and args.part_megabytes is None:
+        argument_parser.error("-resume needs an output split in parts, with -part-t or -part-mb")
+    start = checkpoint["transactions"]
+    first_part = checkpoint["parts"]
+    generator = load_catalog(args.catalog, stats)
+    if generator.first_tree != checkpoint["first_tree"]:
+        argument_parser.error("The catalog %s is not the one of the interrupted run" % args.catalog)
+elif args.append:
+    with open(checkpoint_file) as file:
+        checkpoint = json.load(file)
+    if not checkpoint["complete"]:
+        argument_parser.error("The previous run of %s is not complete, use -resume" % checkpoint_file)
+    first_part = checkpoint["parts"]
+    generator = load_catalog(args.catalog).extension(transactions, stats)
+    # marked incomplete before the catalog is extended: if this run is interrupted, it is resumed instead of skipped
+    write_checkpoint(checkpoint_file, args, generator.first_tree, 0, first_part, False)
+    save_catalog(generator, args.catalog)
+elif args.catalog is not None and os.path.exists(args.catalog):
+    generator = load_catalog(args.catalog, stats)
+else:
+    generator = TransactionGenerator(transactions, patterns, avg_pattern_length, number_of_fields, threshold, show, args.seed, stats, args.ids,
+                                     args.cardinality, args.skew)
+    if args.catalog is not None:
+        save_catalog(generator, args.catalog)
+# slice of the transactions generated by this node
+first, last = 0, generator.total_trees
+if node is not None:
+    try:
+        first, last = generator.node_slice(*node)
+    except ValueError as error:
+        argument_parser.error("-shard: %s" % error)
+if not args.resume:
+    start = first
+stats.total_transactions = last - start
+# the temporary files are next to the output by default: the default temporary directory is often too small
+tmpdir = os.path.dirname(os.path.abspath(args.output)) if args.tmpdir is None else args.tmpdir
+with contextlib.ExitStack() as resources:
+    if args.stream:
+        trees = generator.iter_transactions(args.processes, start, last)
+    else:
+        if args.buckets is not None:
+            # removed at the end, also when the generation or the writing fails
+            trees = resources.enter_context(ExternalShuffle(args.buckets, generator.seed, tmpdir))
+            for tree in generator.iter_transactions(args.processes, first, last):
+                trees.add(tree)
+        else:
+            trees = list(generator.iter_transactions(args.processes, first, last))
+            np.random.default_rng(generator.seed).shuffle(trees)
+        # the shuffle depends only on the seed, so the transactions already written are the first ones
+        trees = itertools.islice(trees, start - first, None)
+    if args.format == "bin":
+        writer = ColumnarWriter(args.output, generator.attributes, generator.ids, generator.dictionary)
+        csv_writer = None
+    else:
+        part_bytes = None if args.part_megabytes is None else int(args.part_megabytes * (1 << 20))
+        writer = CsvWriter(args.output, generator.attributes, args.compression, args.part_transactions, part_bytes, first_part, args.append, args.index)
+        csv_writer = writer
+    # the progress of a csv output is saved with its catalog, so that the run can be resumed
+    save_progress = args.catalog is not None and csv_writer is not None
+    if args.pipeline is not None:
+        writer = PipelinedWriter(writer, args.pipeline, args.formatters)
+    manifest = None
+    if args.manifest:
+        generator.prepare()
+        manifest = ManifestWriter(args.output, generator.patterns, generator.attributes, generator.threshold)
+    with writer:
+        completed = (0, 0)
+        for tree in trees:
+            with stats.phase("writing"):
+                writer.write(tree)
+                if manifest is not None:
+                    manifest.write(tree)
+            # read once: the writer may be updating it from its own thread
+            if save_progress and csv_writer.completed != completed:
+                completed = csv_writer.completed
+                write_checkpoint(checkpoint_file, args, generator.first_tree, start + completed[1], first_part + completed[0], False)
+    if save_progress:
+        write_checkpoint(checkpoint_file, args, generator.first_tree, last, first_part + csv_writer.completed[0], True)
+if manifest is not None:
+    manifest.close()
+if args.stats:
+    print(stats.report(), file=sys.stderr)
@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 
-from typing import Dict, List
+from typing import Dict, List, Iterator, Tuple
+
+import numpy as np
 
 
 class PatternTree:
@@ -40,17 +42,17 @@ class PatternTree:
         return s
 
     def print_tree(self, tabs: int = 0) -> None:
-        print(self.__repr__())
-        for child in self.children:
-            for _ in range(tabs+1):
-                print("\t", end="")
-            child.print_tree(tabs + 1)
+        _print_walk(self, tabs)
+
+    def iter_nodes(self) -> Iterator:
+        """
+        Iterate over the nodes of the subtree in pre-order, without recursion
+        :return: an iterator over the nodes, starting from this one
+        """
+        return (node for node, _ in walk(self))
 
     def get_nodes_list(self) -> []:
-        nodes_list: List[PatternTree] = [self]
-        for child in self.children:
-            nodes_list.extend(child.get_nodes_list())
-        return nodes_list
+        return list(self.iter_nodes())
 
     def __eq__(self, o: object) -> bool:
         if not isinstance(o, PatternTree):
@@ -76,17 +78,17 @@ class TransactionTree:
         child.fields["parent"] = self.fields["rid"]
 
     def print_tree(self, tabs: int = 0) -> None:
-        print(self.__repr__())
-        for child in self.children:
-            for _ in range(tabs+1):
-                print("\t", end="")
-            child.print_tree(tabs + 1)
+        _print_walk(self, tabs)
+
+    def iter_nodes(self) -> Iterator:
+        """
+        Iterate over the nodes of the subtree in pre-order, without recursion
+        :return: an iterator over the nodes, starting from this one
+        """
+        return (node for node, _ in walk(self))
 
     def get_nodes_list(self) -> []:
-        nodes_list: List[PatternTree] = [self]
-        for child in self.children:
-            nodes_list.extend(child.get_nodes_list())
-        return nodes_list
+        return list(self.iter_nodes())
 
     def __repr__(self) -> str:
         length = len(self.fields)
@@ -110,3 +112,254 @@ class TransactionTree:
         if not isinstance(o, TransactionTree):
             return False
         return self.fields == o.fields
+
+
+class TransactionRecord:
+    """
+    Read-only view of a record stored in a TransactionBatch. It exposes the same interface as a
+    TransactionTree node, decoding the fields only when they are accessed
+    """
+    __slots__ = ("batch", "row")
+
+    def __init__(self, batch, row: int) -> None:
+        self.batch: TransactionBatch = batch
+        self.row = row
+
+    @property
+    def rid(self):
+        return self.batch.rid_of(self.row)
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        parent = self.batch.parents[self.row]
+        fields = {"tid": self.batch.tid, "rid": self.rid, "parent": None if parent < 0 else self.batch.rid_of(parent)}
+        fields.update(zip(self.batch.attributes, _split_hex(self.batch.decoded_values(self.row))))
+        return fields
+
+    @property
+    def children(self) -> List:
+        return [TransactionRecord(self.batch, row) for row in self.batch.children_rows(self.row)]
+
+    def print_tree(self, tabs: int = 0) -> None:
+        _print_walk(self, tabs)
+
+    def iter_nodes(self) -> Iterator:
+        """
+        Iterate over the nodes of the subtree in pre-order, without recursion
+        :return: an iterator over the nodes, starting from this one
+        """
+        return (node for node, _ in walk(self))
+
+    def get_nodes_list(self) -> []:
+        return list(self.iter_nodes())
+
+    def __repr__(self) -> str:
+        return "Node(" + ", ".join("'%s' = %s" % (f, v) for f, v in self.fields.items()) + ")"
+
+    def __hash__(self) -> int:
+        return hash(self.rid)
+
+    def __eq__(self, o: object) -> bool:
+        if not isinstance(o, (TransactionRecord, TransactionTree)):
+            return False
+        return self.fields == o.fields
+
+
+class TransactionBatch:
+    """
+    Compact storage of a transaction. Records are rows in pre-order, the parent of each record is
+    a row index (-1 for the root), and ids and values are 16-byte binary columns, rendered as
+    32-character hex strings only when needed. Ids can also be 64-bit integers, in which case tid
+    is an int and rids an int64 column. With a dictionary, values are the integer codes of the values
+    in the dictionary of their field. It exposes the interface of the root node
+    """
+    __slots__ = ("attributes", "tid", "rids", "parents", "values", "embedded", "dictionary", "_children")
+
+    # dtype of ids and values: the 16 bytes of a 32-character hex string
+    VALUE_DTYPE = np.dtype("V16")
+    # dtype of integer ids
+    ID_DTYPE = np.dtype("int64")
+
+    def __init__(self, attributes: List[str], tid, rids: np.ndarray, parents: np.ndarray, values: np.ndarray, embedded: np.ndarray = None,
+                 dictionary=None) -> None:
+        """
+        Create a transaction from its columns
+        :param attributes: names of the fields, excluding tid, rid and parent
+        :param tid: id of the transaction
+        :param rids: id of every record
+        :param parents: row of the parent of every record, -1 for the root. Parents come before their children
+        :param values: one row per record, one column per attribute
+        :param embedded: if known, one row per pattern embedded in the transaction: index of the pattern and row of its root
+        :param dictionary: if set, the ValueDictionary of which values are codes
+        """
+        if len(rids) != len(parents) or values.shape != (len(rids), len(attributes)):
+            raise ValueError("Columns of different sizes: %d ids, %d parents, values %s" % (len(rids), len(parents), values.shape))
+        self.attributes = attributes
+        self.tid = tid
+        self.rids = rids
+        self.parents = parents
+        self.values = values
+        self.embedded = embedded
+        self.dictionary = dictionary
+        self._children = None
+
+    @staticmethod
+    def from_columns(attributes: List[str], tid, rids: np.ndarray, parents: np.ndarray, values: np.ndarray, embedded: np.ndarray = None,
+                     dictionary=None):
+        """
+        Create a transaction from columns in any order where node 0 is the root, sorting them in pre-order
+        :param attributes: names of the fields, excluding tid, rid and parent
+        :param tid: id of the transaction
+        :param rids: id of every record
+        :param parents: row of the parent of every record, -1 for the root
+        :param values: one row per record, one column per attribute
+        :param embedded: if known, index and root of every embedded pattern, the root given in the same order as the columns
+        :param dictionary: if set, the ValueDictionary of which values are codes
+        :return: the TransactionBatch
+        """
+        order = pre_order(parents)
+        rows = np.empty(len(order), dtype=np.int32)
+        rows[order] = np.arange(len(order), dtype=np.int32)
+        sorted_parents = parents[order]
+        sorted_parents[1:] = rows[sorted_parents[1:]]
+        if embedded is not None:
+            embedded = np.stack([embedded[:, 0], rows[embedded[:, 1]]], axis=1).astype(np.int32)
+        return TransactionBatch(attributes, tid, rids[order], sorted_parents, values[order], embedded, dictionary)
+
+    def __len__(self) -> int:
+        return len(self.rids)
+
+    def rid_of(self, row: int):
+        """
+        Get the id of a record
+        :param row: row of the record
+        :return: the id, a hex string or an int
+        """
+        if self.rids.dtype == self.ID_DTYPE:
+            return int(self.rids[row])
+        return self.rids[row].tobytes().hex()
+
+    def decoded_values(self, rows=slice(None)) -> np.ndarray:
+        """
+        Get the 16-byte values of records, looking them up in the dictionary if there is one
+        :param rows: index or slice of the records, all of them by default
+        :return: the values, one column per attribute
+        """
+        if self.dictionary is None:
+            return self.values[rows]
+        return self.dictionary.decode(self.values[rows])
+
+    def children_rows(self, row: int) -> np.ndarray:
+        """
+        Get the rows of the children of a record
+        :param row: row of the record
+        :return: the rows of its children, in order
+        """
+        if self._children is None:
+            self._children = group_children(self.parents)
+        order, offsets = self._children
+        return order[offsets[row + 1]:offsets[row + 2]]
+
+    def to_rows(self) -> List[List[str]]:
+        """
+        Render all the records at once
+        :return: one list per record: tid, rid, parent id ("None" for the root), then the attribute values
+        """
+        rids = [str(rid) for rid in self.rids.tolist()] if self.rids.dtype == self.ID_DTYPE else _split_hex(self.rids)
+        values = _split_hex(self.decoded_values())
+        width = len(self.attributes)
+        tid = str(self.tid)
+        rows = []
+        for row in range(len(self)):
+            parent = self.parents[row]
+            rows.append([tid, rids[row], "None" if parent < 0 else rids[parent]] + values[row * width:(row + 1) * width])
+        return rows
+
+    @property
+    def root(self) -> TransactionRecord:
+        return TransactionRecord(self, 0)
+
+    @property
+    def rid(self) -> str:
+        return self.root.rid
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        return self.root.fields
+
+    @property
+    def children(self) -> List[TransactionRecord]:
+        return self.root.children
+
+    def print_tree(self) -> None:
+        self.root.print_tree()
+
+    def iter_nodes(self) -> Iterator[TransactionRecord]:
+        # rows are stored in pre-order
+        return (TransactionRecord(self, row) for row in range(len(self)))
+
+    def get_nodes_list(self) -> List[TransactionRecord]:
+        return list(self.iter_nodes())
+
+
+def walk(root) -> Iterator[Tuple[object, int]]:
+    """
+    Visit a tree in pre-order with an explicit stack, so that its depth is not limited by the recursion limit
+    :param root: the root, any node with a children list
+    :return: an iterator over the nodes and their depth, the root having depth 0
+    """
+    stack = [(root, 0)]
+    while len(stack) > 0:
+        node, depth = stack.pop()
+        yield node, depth
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+
+
+def _print_walk(root, tabs: int) -> None:
+    """
+    Print a tree, one node per line, indenting every node but the root by its depth plus tabs
+    """
+    for node, depth in walk(root):
+        print("\t" * (tabs + depth) if depth > 0 else "", end="")
+        print(node.__repr__())
+
+
+def group_children(parents: np.ndarray):
+    """
+    Group the nodes of a tree by parent
+    :param parents: index of the parent of every node, -1 for the root
+    :return: the nodes sorted by parent, keeping their order, and the offsets of each parent in that
+    array: the children of node i are order[offsets[i + 1]:offsets[i + 2]]
+    """
+    order = np.argsort(parents, kind="stable")
+    offsets = np.zeros(len(parents) + 2, dtype=np.int64)
+    np.cumsum(np.bincount(parents + 1, minlength=len(parents) + 1), out=offsets[1:])
+    return order, offsets
+
+
+def pre_order(parents: np.ndarray) -> np.ndarray:
+    """
+    Compute the pre-order of a tree whose node 0 is the root, visiting children by increasing index
+    :param parents: index of the parent of every node, -1 for the root
+    :return: the indexes of the nodes in pre-order
+    """
+    order, offsets = group_children(parents)
+    order = order.tolist()
+    offsets = offsets.tolist()
+    visit = []
+    stack = [0]
+    while len(stack) > 0:
+        node = stack.pop()
+        visit.append(node)
+        stack.extend(reversed(order[offsets[node + 1]:offsets[node + 2]]))
+    return np.array(visit, dtype=np.int64)
+
+
+def _split_hex(column: np.ndarray) -> List[str]:
+    """
+    Render a binary column as 32-character hex strings, hex-encoding it in one call
+    :param column: array of 16-byte values
+    :return: the list of hex strings
+    """
+    text = column.tobytes().hex()
+    return [text[i:i + 32] for i in range(0, len(text), 32)]
@@ -0,0 +1,36 @@
+from __future__ import absolute_import
+
+import argparse
+import sys
+
+from logic.manifest import load_manifest
+from logic.verifier import PatternVerifier
+
+argument_parser = argparse.ArgumentParser(description="Count the true support of the generated patterns in a dataset")
+argument_parser.add_argument("-data", dest="data", type=str, nargs="+", help="CSV files of the dataset, e.g. all its part files", required=True)
+argument_parser.add_argument("-manifest", dest="manifest", type=str, nargs="+", help="Manifest written by main.py with -manifest, or the manifests of all the -shard nodes", required=True)
+args = argument_parser.parse_args()
+manifest = load_manifest(args.manifest[0])
+patterns = manifest["patterns"]
+# the nodes of a sharded generation embed the same patterns, each in its own transactions
+for path in args.manifest[1:]:
+    for pattern, other in zip(patterns, load_manifest(path)["patterns"]):
+        pattern["embeddings"] += other["embeddings"]
+        pattern["transactions"] += other["transactions"]
+verifier = PatternVerifier([pattern["nodes"] for pattern in patterns])
+verifier.load(args.data)
+failures = 0
+for index, pattern in enumerate(patterns):
+    occurrences, transactions = verifier.count(index)
+    status = "OK"
+    if occurrences < pattern["embeddings"]:
+        status = "MISSING EMBEDDINGS"
+    elif occurrences < manifest["threshold"]:
+        status = "BELOW THRESHOLD"
+    if status != "OK":
+        failures += 1
+    print("Pattern %d (%d nodes): embedded %d times in %d transactions, found %d times in %d transactions: %s" % (
+        index, len(pattern["nodes"]), pattern["embeddings"], pattern["transactions"], occurrences, transactions, status))
+print("%d records, %d patterns, %d failures" % (verifier.records, len(patterns), failures))
+if failures > 0:
+    sys.exit(1)
@@ -0,0 +1,56 @@
+from __future__ import absolute_import
+
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from logic.catalog import save_catalog, load_catalog
+from logic.generator import TransactionGenerator
+
+
+class TestCatalog(TestCase):
+    def test_round_trip(self):
+        for cardinality in [None, 40]:
+            self.check_round_trip(TransactionGenerator(25, 5, 3, 8, 3, seed=4, cardinality=cardinality, skew=1.0))
+
+    def check_round_trip(self, generator):
+        with tempfile.TemporaryDirectory() as directory:
+            # the path is used as given, without adding .npz
+            path = os.path.join(directory, "catalog")
+            save_catalog(generator, path)
+            self.assertEqual(os.listdir(directory), ["catalog"])
+            loaded = load_catalog(path)
+        self.assertEqual(loaded.attributes, generator.attributes)
+        self.assertEqual(loaded.patterns, generator.patterns)
+        self.assertEqual([tree.to_rows() for tree in loaded.generate_data()], [tree.to_rows() for tree in generator.generate_data()])
+
+    def test_resume(self):
+        generator = TransactionGenerator(30, 4, 3, 10, 3, seed=6, shard_size=7)
+        trees = [tree.to_rows() for tree in generator.iter_transactions()]
+        for start in [0, 10, 14, 30]:
+            self.assertEqual([tree.to_rows() for tree in generator.iter_transactions(start=start)], trees[start:])
+        self.assertEqual([tree.to_rows() for tree in generator.iter_transactions(2, 10)], trees[10:])
+        with self.assertRaises(ValueError):
+            list(generator.iter_transactions(start=31))
+
+    def test_extension(self):
+        generator = TransactionGenerator(400, 6, 3, 10, 20, seed=8, ids="int")
+        extension = generator.extension(200)
+        self.assertEqual(extension.attributes, generator.attributes)
+        self.assertIs(extension.patterns, generator.patterns)
+        trees = generator.generate_data() + extension.generate_data()
+        self.assertEqual([tree.tid for tree in trees], list(range(600)))
+        rids = [rid for tree in trees for rid in tree.rids.tolist()]
+        self.assertEqual(len(set(rids)), len(rids))
+        # every pattern is embedded in the same fraction of the transactions
+        self.assertTrue(np.all(np.abs(extension.occurrences - generator.occurrences / 2) <= 0.5))
+        embedded = np.bincount(np.concatenate([tree.embedded[:, 0] for tree in trees[400:]]), minlength=6)
+        self.assertEqual(embedded.tolist(), extension.occurrences.tolist())
+        # and the extension of a loaded catalog is the same
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.npz")
+            save_catalog(generator, path)
+            loaded = load_catalog(path).extension(200)
+        self.assertEqual([tree.to_rows() for tree in loaded.generate_data()], [tree.to_rows() for tree in trees[400:]])
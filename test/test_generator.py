@@ -3,7 +3,10 @@ from __future__ import absolute_import
 import random
 from unittest import TestCase
 
-from logic.generator import TransactionGenerator, PatternGenerator
+import numpy as np
+
+from logic.generator import TransactionGenerator, PatternGenerator, PatternTemplate
+from logic.values import ValuePool
 
 
 class TestGenerator(TestCase):
@@ -51,3 +54,133 @@ class TestGenerator(TestCase):
                 self.assertTrue("tid" in node.fields)
                 self.assertTrue("parent" in node.fields)
                 print(len(node.fields))
+
+    def test_iter_transactions(self):
+        tree_count = 30
+        generator = TransactionGenerator(tree_count, 5, 3, 10, 3)
+        count = 0
+        for tree in generator.iter_transactions():
+            tids = set(record.fields["tid"] for record in tree.get_nodes_list())
+            self.assertEqual(len(tids), 1)
+            count += 1
+        self.assertEqual(count, tree_count)
+
+    def test_shard_placement(self):
+        generator = TransactionGenerator(50, 4, 3, 10, 5, seed=2, shard_size=7)
+        generator.prepare()
+        self.assertTrue(np.all(generator.occurrences >= generator.threshold))
+        placed = np.zeros(4, dtype=np.int64)
+        for shard in range(generator.shards):
+            pattern_indexes, tree_offsets = generator.shard_placement(shard, np.random.default_rng(0))
+            trees = min(50, (shard + 1) * 7) - shard * 7
+            self.assertEqual(len(tree_offsets), trees + 1)
+            self.assertEqual(tree_offsets[-1], len(pattern_indexes))
+            self.assertEqual(pattern_indexes.dtype, np.int32)
+            placed += np.bincount(pattern_indexes, minlength=4)
+            for index in range(trees):
+                in_tree = list(pattern_indexes[tree_offsets[index]:tree_offsets[index + 1]])
+                self.assertEqual(in_tree, sorted(in_tree))
+        # the shards share out exactly the occurrences of every pattern
+        self.assertEqual(placed.tolist(), generator.occurrences.tolist())
+
+    def test_seed_reproducible(self):
+        first = TransactionGenerator(25, 4, 3, 10, 3, seed=42)
+        second = TransactionGenerator(25, 4, 3, 10, 3, seed=42)
+        self.assertEqual(first.attributes, second.attributes)
+        first_rows = [record.fields for tree in first.generate_data() for record in tree.get_nodes_list()]
+        second_rows = [record.fields for tree in second.generate_data() for record in tree.get_nodes_list()]
+        self.assertEqual(first_rows, second_rows)
+
+    def test_processes(self):
+        serial = TransactionGenerator(30, 4, 3, 10, 3, seed=7, shard_size=7).generate_data()
+        parallel = TransactionGenerator(30, 4, 3, 10, 3, seed=7, shard_size=7).generate_data(processes=3)
+        self.assertEqual(len(parallel), 30)
+        self.assertEqual([tree.fields for tree in serial], [tree.fields for tree in parallel])
+
+    def test_pattern_template(self):
+        generator = TransactionGenerator(10, 2, 3, 10, 1)
+        pattern = PatternGenerator.generate_pattern(6, [f for f in generator.attributes])
+        template = PatternTemplate(pattern, generator.attributes)
+        self.assertEqual(len(template), 7)
+        self.assertEqual(template.parent_offsets[0], -1)
+        for offset, pattern_node in enumerate(pattern.get_nodes_list()):
+            self.assertLess(template.parent_offsets[offset], offset)
+            for column, field in enumerate(generator.attributes):
+                self.assertEqual(template.fixed_mask[offset, column], field in pattern_node.fields)
+                if field in pattern_node.fields:
+                    self.assertEqual(template.fixed_values[offset, column].tobytes().hex(), pattern_node.fields[field])
+
+    def test_generate_patterns(self):
+        fields = ["a", "b", "c", "d"]
+        lengths = np.array([1, 4, 9, 2])
+        patterns = PatternGenerator.generate_patterns(lengths, fields, np.random.default_rng(0), ValuePool(0))
+        self.assertEqual(len(patterns), len(lengths))
+        for pattern, length in zip(patterns, lengths):
+            nodes = pattern.get_nodes_list()
+            self.assertEqual(len(nodes), length + 1)
+            self.assertGreater(len(nodes[0].fields), 0)
+            filled = [frozenset(node.fields.items()) for node in nodes if node.fields]
+            self.assertEqual(len(set(filled)), len(filled))
+            for node in nodes:
+                self.assertTrue(set(node.fields) <= set(fields))
+        with self.assertRaises(ValueError):
+            PatternGenerator.generate_patterns([3, 0], fields)
+
+    def test_tree_structure(self):
+        generator = TransactionGenerator(20, 6, 4, 10, 3, seed=5)
+        trees = generator.generate_data()
+        for index, tree in enumerate(trees):
+            placed = tree.embedded[:, 0]
+            pattern_records = sum(len(generator.pattern_templates[pattern_index]) for pattern_index in placed)
+            random_records = 1 + int(generator.avg_pattern_length + generator.avg_pattern_length * len(placed))
+            self.assertEqual(len(tree), pattern_records + random_records)
+            self.assertEqual(tree.parents[0], -1)
+            for row in range(1, len(tree)):
+                self.assertLess(tree.parents[row], row)
+            self.assertEqual(len(tree.get_nodes_list()), len(tree.root.get_nodes_list()))
+
+    def test_integer_ids(self):
+        generator = TransactionGenerator(25, 4, 3, 10, 3, seed=3, ids="int", shard_size=10)
+        trees = generator.generate_data()
+        self.assertEqual([tree.tid for tree in trees], list(range(25)))
+        rids = [record.rid for tree in trees for record in tree.get_nodes_list()]
+        self.assertEqual(len(set(rids)), len(rids))
+        self.assertEqual(rids[0], 0)
+        self.assertEqual(trees[10].rid, 1 << 32)
+        for tree in trees:
+            for record in tree.get_nodes_list():
+                self.assertEqual(len(record.fields), 10)
+                self.assertTrue(record.fields["parent"] is None or record.fields["parent"] < record.rid)
+            self.assertEqual(len({record for record in tree.get_nodes_list()}), len(tree))
+
+    def test_dictionary(self):
+        generator = TransactionGenerator(30, 5, 3, 10, 3, seed=4, cardinality=20, skew=1.0)
+        trees = generator.generate_data(2)
+        domains = [set(generator.dictionary.values[column].tobytes().hex()[i:i + 32] for i in range(0, 640, 32))
+                   for column in range(len(generator.attributes))]
+        for tree in trees:
+            self.assertEqual(tree.values.dtype, np.uint8)
+            for record in tree.get_nodes_list():
+                for column, field in enumerate(generator.attributes):
+                    self.assertIn(record.fields[field], domains[column])
+        for pattern in generator.patterns:
+            for node in pattern.get_nodes_list():
+                for field, value in node.fields.items():
+                    self.assertIn(value, domains[generator.attributes.index(field)])
+
+    def test_node_slice(self):
+        generator = TransactionGenerator(30, 4, 3, 10, 3, seed=12, ids="int", shard_size=4)
+        trees = [tree.to_rows() for tree in generator.generate_data()]
+        slices = [generator.node_slice(node, 3) for node in range(3)]
+        self.assertEqual(slices, [(0, 10), (10, 20), (20, 30)])
+        union = []
+        for first, last in slices:
+            union.extend(tree.to_rows() for tree in generator.iter_transactions(2, first, last))
+        self.assertEqual(union, trees)
+        self.assertEqual([tree.to_rows() for tree in generator.iter_transactions(1, 5, 10)], trees[5:10])
+        self.assertEqual(generator.node_slice(9, 10), (27, 30))
+        self.assertEqual(generator.node_slice(0, 30), (0, 1))
+        with self.assertRaises(ValueError):
+            generator.node_slice(3, 3)
+        with self.assertRaises(ValueError):
+            generator.node_slice(0, 31)
@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+
+import os
+import tempfile
+from unittest import TestCase
+
+from logic.generator import TransactionGenerator
+from logic.pipeline import PipelinedWriter
+from logic.writer import CsvWriter
+
+
+class FailingWriter:
+    def __init__(self):
+        self.written = 0
+
+    def write(self, tree):
+        self.written += 1
+        raise IOError("disk full")
+
+    def close(self):
+        pass
+
+
+class FailingClose:
+    def write(self, tree):
+        pass
+
+    def close(self):
+        raise IOError("disk full")
+
+
+class TestPipelinedWriter(TestCase):
+    def test_same_output(self):
+        generator = TransactionGenerator(30, 4, 3, 10, 3, seed=2)
+        with tempfile.TemporaryDirectory() as directory:
+            with CsvWriter(os.path.join(directory, "direct"), generator.attributes) as writer:
+                for tree in generator.iter_transactions():
+                    writer.write(tree)
+            with PipelinedWriter(CsvWriter(os.path.join(directory, "pipelined"), generator.attributes), 2) as writer:
+                for tree in generator.iter_transactions():
+                    writer.write(tree)
+            with open(os.path.join(directory, "direct.csv")) as direct, open(os.path.join(directory, "pipelined.csv")) as pipelined:
+                self.assertEqual(direct.read(), pipelined.read())
+
+    def test_formatters(self):
+        generator = TransactionGenerator(40, 4, 3, 10, 3, seed=3)
+        with tempfile.TemporaryDirectory() as directory:
+            with CsvWriter(os.path.join(directory, "direct"), generator.attributes, index=True) as writer:
+                for tree in generator.iter_transactions():
+                    writer.write(tree)
+            with PipelinedWriter(CsvWriter(os.path.join(directory, "formatted"), generator.attributes, index=True), 4, 2) as writer:
+                for tree in generator.iter_transactions():
+                    writer.write(tree)
+            for extension in [".csv", ".index"]:
+                with open(os.path.join(directory, "direct" + extension), "rb") as direct, \
+                        open(os.path.join(directory, "formatted" + extension), "rb") as formatted:
+                    self.assertEqual(direct.read(), formatted.read())
+        with self.assertRaises(ValueError):
+            PipelinedWriter(FailingWriter(), 1, -1)
+
+    def test_error(self):
+        generator = TransactionGenerator(30, 4, 3, 10, 3, seed=2)
+        failing = FailingWriter()
+        with self.assertRaises(IOError):
+            with PipelinedWriter(failing, 1) as writer:
+                for tree in generator.iter_transactions():
+                    writer.write(tree)
+        self.assertEqual(failing.written, 1)
+        with self.assertRaises(ValueError):
+            PipelinedWriter(failing, 0)
+        # an error after the last transaction does not wait for more
+        with self.assertRaises(IOError):
+            with PipelinedWriter(FailingClose(), 1) as writer:
+                writer.write(generator.generate_shard(0)[0])
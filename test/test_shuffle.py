@@ -0,0 +1,33 @@
+from __future__ import absolute_import
+
+import os
+from unittest import TestCase
+
+from logic.generator import TransactionGenerator
+from logic.shuffle import ExternalShuffle
+
+
+class TestExternalShuffle(TestCase):
+    def test_permutation(self):
+        generator = TransactionGenerator(40, 4, 3, 10, 3, seed=9)
+        trees = generator.generate_data()
+        shuffle = ExternalShuffle(4, seed=1)
+        for tree in trees:
+            shuffle.add(tree)
+        shuffled = [tree.tid for tree in shuffle]
+        self.assertEqual(sorted(shuffled), sorted(tree.tid for tree in trees))
+        self.assertNotEqual(shuffled, [tree.tid for tree in trees])
+        self.assertFalse(os.path.exists(shuffle.directory))
+
+    def test_uniform(self):
+        # every item must be able to end up in every position with about the same frequency
+        positions = [[0] * 3 for _ in range(3)]
+        for seed in range(600):
+            shuffle = ExternalShuffle(2, seed=seed)
+            for item in range(3):
+                shuffle.add(item)
+            for position, item in enumerate(shuffle):
+                positions[item][position] += 1
+        for item in range(3):
+            for position in range(3):
+                self.assertGreater(positions[item][position], 140)
@@ -0,0 +1,33 @@
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from logic.generator import TransactionGenerator
+from logic.stats import GenerationStats
+
+
+class TestGenerationStats(TestCase):
+    def test_generation_stats(self):
+        notifications = []
+        stats = GenerationStats(lambda s: notifications.append(s.finished), interval=0)
+        generator = TransactionGenerator(30, 4, 3, 10, 3, seed=1, stats=stats)
+        trees = generator.generate_data()
+        self.assertEqual(stats.counters["transactions"], 30)
+        self.assertEqual(stats.counters["records"], sum(len(tree) for tree in trees))
+        self.assertEqual(stats.counters["patterns"], 4)
+        for phase in ["patterns", "placement", "random values", "embedding", "assembly"]:
+            self.assertIn(phase, stats.phases)
+        self.assertGreater(len(notifications), 1)
+        self.assertTrue(notifications[-1])
+        self.assertIn("records/s", stats.report())
+
+    def test_merge(self):
+        first = GenerationStats()
+        second = GenerationStats()
+        first.count("records", 3)
+        second.count("records", 4)
+        with second.phase("writing"):
+            pass
+        first.merge(second)
+        self.assertEqual(first.counters["records"], 7)
+        self.assertIn("writing", first.phases)
@@ -1,10 +1,15 @@
 from __future__ import absolute_import
 
 import random
+import contextlib
+import io
+import sys
 from unittest import TestCase
 
-from logic.generator import PatternGenerator
-from models.tree import PatternTree
+import numpy as np
+
+from logic.generator import PatternGenerator, TransactionGenerator
+from models.tree import PatternTree, TransactionBatch, pre_order
 from logic.values import ValueGenerator
 
 
@@ -26,3 +31,58 @@ class TestTree(TestCase):
             # check length of each record
             for record in records:
                 self.assertTrue(len(record.fields) <= 10)
+
+    def test_batch_nodes(self):
+        attributes = ValueGenerator.generate_field_names(4)
+        tid = ValueGenerator.random_string()
+        parents = np.array([-1, 0, 1, 0, 3, 3], dtype=np.int32)
+        rids = np.frombuffer(np.random.default_rng(0).bytes(16 * 6), dtype=TransactionBatch.VALUE_DTYPE)
+        values = np.frombuffer(np.random.default_rng(1).bytes(16 * 6 * 4), dtype=TransactionBatch.VALUE_DTYPE).reshape(6, 4)
+        batch = TransactionBatch(attributes, tid, rids, parents, values)
+        hex_rids = [rid.tobytes().hex() for rid in rids]
+        self.assertEqual(len(batch), 6)
+        self.assertEqual([record.rid for record in batch.get_nodes_list()], hex_rids)
+        self.assertEqual([record.rid for record in batch.root.get_nodes_list()], hex_rids)
+        self.assertEqual([child.rid for child in batch.children], [hex_rids[1], hex_rids[3]])
+        rows = batch.to_rows()
+        self.assertEqual(rows[0][2], "None")
+        self.assertEqual(rows[4], [tid, hex_rids[4], hex_rids[3]] + [value.tobytes().hex() for value in values[4]])
+        self.assertEqual(batch.get_nodes_list()[4].fields, dict(zip(["tid", "rid", "parent"] + attributes, [tid, hex_rids[4], hex_rids[3]] + rows[4][3:])))
+
+    def test_pre_order(self):
+        parents = np.array([-1, 0, 0, 1, 2, 1, 3], dtype=np.int32)
+        self.assertEqual(pre_order(parents).tolist(), [0, 1, 3, 6, 5, 2, 4])
+
+    def test_deep_tree(self):
+        # a chain much deeper than the recursion limit
+        depth = 3 * sys.getrecursionlimit()
+        root = PatternTree({"a": "1"})
+        node = root
+        for _ in range(depth):
+            child = PatternTree({})
+            node.add_child(child)
+            node = child
+        self.assertEqual(sum(1 for _ in root.iter_nodes()), depth + 1)
+        generator = TransactionGenerator(5, 2, 3, 8, 1)
+        transaction = generator.tree_pattern_to_transaction_tree(root)
+        generator.populate_transaction_pattern(transaction, "tid")
+        nodes = transaction.get_nodes_list()
+        self.assertEqual(len(nodes), depth + 1)
+        self.assertEqual(nodes[0].fields["a"], "1")
+        for parent, child in zip(nodes, nodes[1:]):
+            self.assertEqual(child.fields["parent"], parent.rid)
+            self.assertEqual(len(child.fields), 3 + len(generator.attributes))
+        with contextlib.redirect_stdout(io.StringIO()):
+            transaction.print_tree()
+
+    def test_print_tree(self):
+        root = PatternTree({"a": "1"})
+        child = PatternTree({})
+        root.add_child(child)
+        child.add_child(PatternTree({"b": "2"}))
+        root.add_child(PatternTree({"c": "3"}))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            root.print_tree()
+        self.assertEqual(output.getvalue(), "Node('a' = 1)\n\tNode(<Anything>)\n\t\tNode('b' = 2)\n\tNode('c' = 3)\n")
+        self.assertEqual([node.fields for node in root.iter_nodes()], [{"a": "1"}, {}, {"b": "2"}, {"c": "3"}])
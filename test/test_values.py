@@ -1,8 +1,11 @@
 from __future__ import absolute_import
 
+import pickle
 from unittest import TestCase
 
-from logic.values import ValueGenerator
+import numpy as np
+
+from logic.values import ValueGenerator, ValuePool, ValueDictionary
 
 
 class TestValueGenerator(TestCase):
@@ -14,3 +17,57 @@ class TestValueGenerator(TestCase):
         fields = 10
         values = ValueGenerator.generate_field_names(fields)
         self.assertEqual(len(values), fields)
+
+    def test_pool_seed(self):
+        first = ValuePool(3, batch_size=10)
+        second = ValuePool(3, batch_size=7)
+        first_values = [first.random_string() for _ in range(25)]
+        second_values = second.take(5) + [second.random_string() for _ in range(20)]
+        self.assertEqual(first_values, second_values)
+        self.assertEqual(len(set(first_values)), 25)
+        for value in first_values:
+            self.assertEqual(len(value), 32)
+            int(value, 16)
+
+    def test_pool_take(self):
+        pool = ValuePool(batch_size=4)
+        values = pool.take(10)
+        self.assertEqual(len(values), 10)
+        self.assertEqual(len(pool.take(3)), 3)
+        # only the values served are counted, not the ones left in the pool
+        pool.random_string()
+        pool.take_bytes(2)
+        self.assertEqual(pool.served, 16)
+
+    def test_random_id(self):
+        # the same strings as from a refilled pool, without filling it
+        pool = ValuePool(5)
+        ids = [pool.random_id() for _ in range(7)]
+        self.assertEqual(ids, ValuePool(5).take(7))
+        self.assertEqual(pool.values, [])
+        self.assertEqual(ValueGenerator.generate_field_names(7, ValuePool(5)), ids)
+
+    def test_dictionary(self):
+        dictionary = ValueDictionary(3, 50, 1.5, seed=2)
+        self.assertEqual(dictionary.values.shape, (3, 50))
+        codes = dictionary.draw(np.random.default_rng(0), (5000, 3))
+        self.assertEqual(codes.dtype, np.uint8)
+        self.assertTrue(np.all(codes < 50))
+        counts = np.bincount(codes[:, 0], minlength=50)
+        self.assertGreater(counts[0], counts[1])
+        self.assertGreater(counts[1], counts[10])
+        decoded = dictionary.decode(codes[:2])
+        self.assertEqual(decoded[1, 2], dictionary.values[2, codes[1, 2]])
+        value = dictionary.values[1, 7].tobytes().hex()
+        self.assertEqual(dictionary.code(1, value), 7)
+        self.assertEqual(dictionary.value(1, 7), value)
+        with self.assertRaises(ValueError):
+            dictionary.code(0, value)
+        with self.assertRaises(ValueError):
+            dictionary.code(0, "ff" * 16)
+        # codes of values never interned, e.g. the patterns of a loaded catalog
+        fresh = ValueDictionary(3, 50, 1.5, seed=2)
+        self.assertEqual([fresh.code(2, value.tobytes().hex()) for value in fresh.values[2]], list(range(50)))
+        copy = pickle.loads(pickle.dumps(dictionary))
+        self.assertTrue(np.array_equal(copy.values, dictionary.values))
+        self.assertLess(len(pickle.dumps(dictionary)), 200)
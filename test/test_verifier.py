@@ -0,0 +1,51 @@
+from __future__ import absolute_import
+
+import os
+import tempfile
+from unittest import TestCase
+
+from logic.generator import TransactionGenerator
+from logic.manifest import ManifestWriter, load_manifest
+from logic.verifier import PatternVerifier
+from logic.writer import CsvWriter
+
+
+class TestPatternVerifier(TestCase):
+    def test_manifest_support(self):
+        generator = TransactionGenerator(40, 5, 3, 10, 3, seed=8)
+        trees = generator.generate_data()
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "output")
+            with CsvWriter(prefix, generator.attributes, part_transactions=15) as writer, \
+                    ManifestWriter(prefix, generator.patterns, generator.attributes, generator.threshold) as manifest:
+                for tree in trees:
+                    writer.write(tree)
+                    manifest.write(tree)
+            loaded = load_manifest(prefix + ".manifest.json")
+            with open(prefix + ".occurrences.csv") as file:
+                occurrences = file.read().splitlines()[1:]
+            verifier = PatternVerifier([pattern["nodes"] for pattern in loaded["patterns"]])
+            verifier.load(writer.parts)
+        self.assertEqual(len(occurrences), sum(pattern["embeddings"] for pattern in loaded["patterns"]))
+        self.assertEqual(verifier.records, sum(len(tree) for tree in trees))
+        for index, pattern in enumerate(loaded["patterns"]):
+            self.assertEqual(len(pattern["nodes"]), len(generator.pattern_templates[index]))
+            self.assertGreaterEqual(pattern["embeddings"], generator.threshold)
+            found, transactions = verifier.count(index)
+            self.assertGreaterEqual(found, pattern["embeddings"])
+            self.assertGreaterEqual(transactions, pattern["transactions"])
+
+    def test_wildcard(self):
+        # root with a field, and two children: one with a field, one matching anything
+        pattern = [{"fields": {"a": "1"}, "parent": -1}, {"fields": {"b": "2"}, "parent": 0}, {"fields": {}, "parent": 0}]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.csv")
+            with open(path, "w") as file:
+                file.write("transaction_id,record_id,parent_id,a,b\n")
+                # matches: the root has a child with b = 2 and another child
+                file.write("t1,r1,None,1,0\nt1,r2,r1,0,2\nt1,r3,r1,5,5\n")
+                # does not match: the only child cannot match both pattern children
+                file.write("t2,r4,None,1,0\nt2,r5,r4,0,2\n")
+            verifier = PatternVerifier([pattern])
+            verifier.load([path])
+        self.assertEqual(verifier.count(0), (1, 1))
@@ -0,0 +1,143 @@
+from __future__ import absolute_import
+
+import gzip
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from logic.generator import TransactionGenerator
+from logic.reader import ColumnarDataset, IndexedCsv
+from logic.writer import ColumnarWriter, CsvWriter
+
+
+class TestColumnarWriter(TestCase):
+    def test_round_trip(self):
+        for ids in ["hex", "int"]:
+            self.check_round_trip(ids)
+
+    def check_round_trip(self, ids):
+        generator = TransactionGenerator(15, 4, 3, 10, 3, seed=11, ids=ids)
+        trees = generator.generate_data()
+        with tempfile.TemporaryDirectory() as directory:
+            with ColumnarWriter(directory, generator.attributes, ids) as writer:
+                for tree in trees:
+                    writer.write(tree)
+            dataset = ColumnarDataset(directory)
+            self.assertEqual(dataset.transactions, len(trees))
+            self.assertEqual(len(dataset), sum(len(tree) for tree in trees))
+            self.assertEqual(dataset.attributes, generator.attributes)
+            for index, tree in enumerate(trees):
+                self.assertEqual(dataset.get_transaction(index).to_rows(), tree.to_rows())
+            first = generator.attributes[0]
+            self.assertEqual(dataset.field(first)[0].tobytes().hex(), trees[0].fields[first])
+            del dataset
+
+    def test_dictionary(self):
+        generator = TransactionGenerator(15, 4, 3, 10, 3, seed=11, cardinality=300, skew=1.0)
+        trees = generator.generate_data()
+        with tempfile.TemporaryDirectory() as directory:
+            with ColumnarWriter(directory, generator.attributes, dictionary=generator.dictionary) as writer:
+                for tree in trees:
+                    writer.write(tree)
+            dataset = ColumnarDataset(directory)
+            self.assertEqual(dataset.cardinality, 300)
+            self.assertEqual(dataset.field(generator.attributes[0]).dtype, np.uint16)
+            for index, tree in enumerate(trees):
+                self.assertEqual(dataset.get_transaction(index).to_rows(), tree.to_rows())
+            del dataset
+
+    def test_empty(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with ColumnarWriter(directory, ["a", "b"]):
+                pass
+            dataset = ColumnarDataset(directory)
+            self.assertEqual(dataset.transactions, 0)
+            self.assertEqual(len(dataset.field("a")), 0)
+            del dataset
+            prefix = os.path.join(directory, "output")
+            with CsvWriter(prefix, ["a", "b"]) as writer:
+                pass
+            self.assertEqual(writer.parts, [prefix + ".csv"])
+            with open(prefix + ".csv") as file:
+                self.assertEqual(file.read(), "transaction_id,record_id,parent_id,a,b\n")
+
+
+class TestCsvWriter(TestCase):
+    def test_single_file(self):
+        generator = TransactionGenerator(12, 4, 3, 10, 3, seed=4)
+        trees = generator.generate_data()
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "output")
+            with CsvWriter(prefix, generator.attributes) as writer:
+                for tree in trees:
+                    writer.write(tree)
+            self.assertEqual(writer.parts, [prefix + ".csv"])
+            with open(prefix + ".csv") as file:
+                lines = file.read().splitlines()
+        self.assertEqual(lines[0].split(","), ["transaction_id", "record_id", "parent_id"] + generator.attributes)
+        self.assertEqual([line.split(",") for line in lines[1:]], [row for tree in trees for row in tree.to_rows()])
+
+    def test_compressed_parts(self):
+        generator = TransactionGenerator(25, 4, 3, 10, 3, seed=4)
+        trees = generator.generate_data()
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "output")
+            with CsvWriter(prefix, generator.attributes, "gzip", part_transactions=10) as writer:
+                for tree in trees:
+                    writer.write(tree)
+            self.assertEqual([os.path.basename(part) for part in writer.parts],
+                             ["output-00000.csv.gz", "output-00001.csv.gz", "output-00002.csv.gz"])
+            rows = []
+            for part in writer.parts:
+                with gzip.open(part, "rt") as file:
+                    lines = file.read().splitlines()
+                self.assertTrue(lines[0].startswith("transaction_id,"))
+                rows.extend(line.split(",") for line in lines[1:])
+        self.assertEqual(rows, [row for tree in trees for row in tree.to_rows()])
+
+    def test_append(self):
+        generator = TransactionGenerator(12, 4, 3, 10, 3, seed=4)
+        trees = generator.generate_data()
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, "output")
+            for first, last in [(0, 5), (5, 12)]:
+                with CsvWriter(prefix, generator.attributes, "gzip", append=True) as writer:
+                    for tree in trees[first:last]:
+                        writer.write(tree)
+            with gzip.open(prefix + ".csv.gz", "rt") as file:
+                lines = file.read().splitlines()
+            with CsvWriter(prefix, generator.attributes, part_transactions=5, first_part=3) as writer:
+                for tree in trees:
+                    writer.write(tree)
+            self.assertEqual([os.path.basename(part) for part in writer.parts],
+                             ["output-00003.csv", "output-00004.csv", "output-00005.csv"])
+            self.assertEqual(writer.completed, (3, 12))
+        self.assertEqual(lines[0].split(","), ["transaction_id", "record_id", "parent_id"] + generator.attributes)
+        self.assertEqual([line.split(",") for line in lines[1:]], [row for tree in trees for row in tree.to_rows()])
+
+    def test_index(self):
+        for ids in ["hex", "int"]:
+            generator = TransactionGenerator(25, 4, 3, 10, 3, seed=4, ids=ids)
+            trees = generator.generate_data()
+            with tempfile.TemporaryDirectory() as directory:
+                prefix = os.path.join(directory, "output")
+                with CsvWriter(prefix, generator.attributes, part_transactions=10, index=True) as writer:
+                    for tree in trees:
+                        writer.write(tree)
+                with IndexedCsv(prefix) as output:
+                    self.assertEqual(len(output), len(trees))
+                    for ordinal in [24, 0, 13, 10, 9]:
+                        self.assertEqual(output.get_transaction(ordinal), trees[ordinal].to_rows())
+                    self.assertEqual(output.find(trees[17].tid), 17)
+                    sample = output.sample(6, seed=1)
+                    self.assertEqual(len(sample), 6)
+                    rows = [tree.to_rows() for tree in trees]
+                    self.assertTrue(all(transaction in rows for transaction in sample))
+                    with self.assertRaises(IndexError):
+                        output.get_transaction(25)
+                    with self.assertRaises(KeyError):
+                        output.find("missing")
+        with self.assertRaises(ValueError):
+            CsvWriter(prefix, generator.attributes, "gzip", index=True)